@@ -12,6 +12,17 @@ from . import subset
 from . import indicator
 from . import distance
 from . import sobol
+from .distance import set_num_threads, get_num_threads
 
-__all__ = ["cube", "simplex", "polytope", "subset", "indicator", "distance", "sobol"]
+__all__ = [
+    "cube",
+    "simplex",
+    "polytope",
+    "subset",
+    "indicator",
+    "distance",
+    "sobol",
+    "set_num_threads",
+    "get_num_threads",
+]
 __version__ = "0.9"
@@ -1,11 +1,19 @@
 """
 Functions for (super-uniform) sampling from the unit hypercube.
 """
+import math
+import heapq
 import random
 import itertools
 import numpy as np
 
-from .distance import distance_matrix, distance_to_boundary
+from . import sobol
+from .distance import (
+    distance_matrix,
+    distance_to_boundary,
+    reduce_distances,
+    SpatialIndex,
+)
 
 
 def unitcube(dimension):
@@ -14,10 +22,19 @@ def unitcube(dimension):
     return [0.0] * dimension, [1.0] * dimension
 
 
+def _grid_levels(n_levels, sukharev):
+    """The coordinates of the grid points in each dimension."""
+    if sukharev:
+        return np.linspace(0, 1, n_levels, endpoint=False) + 0.5 / n_levels
+    else:
+        return np.linspace(0, 1, n_levels)
+
+
 def grid(n_levels, dimension, sukharev=False):
     """Create conventional grid in the unit hypercube.
 
-    Also related to full factorial designs.
+    Also related to full factorial designs. For grids too large for the
+    memory, see :class:`Grid`.
 
     Parameters
     ----------
@@ -33,19 +50,184 @@ def grid(n_levels, dimension, sukharev=False):
     -------
     points : (`n_levels` ** `dimension`, `dimension`) numpy array
     """
-    if sukharev:
-        x = np.linspace(0, 1, n_levels, endpoint=False) + 0.5 / n_levels
-    else:
-        x = np.linspace(0, 1, n_levels)
-    return np.array(list(itertools.product(x, repeat=dimension)))
+    x = _grid_levels(n_levels, sukharev)
+    # the last dimension varies fastest, as in itertools.product
+    level_indices = np.indices((n_levels,) * dimension).reshape(dimension, -1)
+    return x[level_indices.T]
+
+
+class Grid:
+    """Lazy conventional grid in the unit hypercube.
+
+    This is the same point set as returned by :func:`grid`, in the same
+    order, but the points are only computed when they are accessed. Point
+    `i` is obtained by writing `i` in base `n_levels`, which takes
+    O(`dimension`) operations. Thus, parts of huge grids can be processed,
+    e.g., by several workers, each processing its own slice. Indexing with
+    an integer returns a single point, indexing with a slice or an array of
+    indices a 2-D array of points.
+
+    Parameters
+    ----------
+    n_levels : int
+        The number of levels in each dimension.
+    dimension : int
+        The dimension of the space.
+    sukharev : bool, optional
+        Switch for creating a Sukharev grid, see :func:`grid`.
+    """
+
+    def __init__(self, n_levels, dimension, sukharev=False):
+        assert n_levels > 0
+        assert dimension > 0
+        self.n_levels = n_levels
+        self.dimension = dimension
+        self.sukharev = sukharev
+        self.levels = _grid_levels(n_levels, sukharev)
+        # unlike len(), this also works beyond 2**63 points
+        self.num_points = n_levels ** dimension
+
+    def __len__(self):
+        return self.num_points
+
+    def __array__(self, dtype=None, copy=None):
+        points = grid(self.n_levels, self.dimension, self.sukharev)
+        if dtype is None:
+            return points
+        return points.astype(dtype)
+
+    def _unrank(self, indices):
+        """Points with the given (non-negative) indices."""
+        level_indices = np.empty(np.shape(indices) + (self.dimension,), dtype=int)
+        for j in reversed(range(self.dimension)):
+            indices, level_indices[..., j] = divmod(indices, self.n_levels)
+        return self.levels[level_indices]
+
+    def __getitem__(self, key):
+        num_points = self.num_points
+        if isinstance(key, slice):
+            start, stop, step = key.indices(num_points)
+            return self._unrank(np.arange(start, stop, step))
+        if isinstance(key, (int, np.integer)):
+            # Python integers also work for grids with more than 2**63 points
+            if not -num_points <= key < num_points:
+                raise IndexError("Grid index out of range")
+            return self._unrank(int(key) % num_points)
+        indices = np.asarray(key)
+        if not np.issubdtype(indices.dtype, np.integer):
+            raise TypeError("Grid indices must be integers or slices")
+        if np.any((indices < -num_points) | (indices >= num_points)):
+            raise IndexError("Grid index out of range")
+        return self._unrank(np.where(indices < 0, indices + num_points, indices))
+
+    def chunks(self, chunk_size, start=0, stop=None):
+        """Iterate over the points in blocks.
+
+        Parameters
+        ----------
+        chunk_size : int
+            The number of points per block (except for the last one).
+        start : int, optional
+            Index of the first point.
+        stop : int, optional
+            Index after the last point. Default is the end of the grid.
+
+        Yields
+        ------
+        points : (`chunk_size`, `dimension`) numpy array
+        """
+        assert chunk_size > 0
+        start, stop, _ = slice(start, stop).indices(self.num_points)
+        for chunk_start in range(start, stop, chunk_size):
+            yield self[chunk_start : min(chunk_start + chunk_size, stop)]
 
 
-def sample_halton(num_points, dimension, skip=20):
+def _first_primes(num_primes):
+    """Return the first `num_primes` prime numbers.
+
+    The primes are obtained with a sieve of Eratosthenes.
+    """
+    assert num_primes >= 0
+    limit = 15
+    if num_primes >= 6:
+        # upper bound for the n-th prime (Rosser's theorem)
+        log_n = math.log(num_primes)
+        limit = int(num_primes * (log_n + math.log(log_n))) + 1
+    is_prime = np.ones(limit + 1, dtype=bool)
+    is_prime[:2] = False
+    for i in range(2, int(limit ** 0.5) + 1):
+        if is_prime[i]:
+            is_prime[i * i :: i] = False
+    return np.flatnonzero(is_prime)[:num_primes]
+
+
+def _radical_inverse(indices, base, permutation=None):
+    """Van der Corput radical inverse of integers in the given base.
+
+    The digits of the integers are mirrored at the radix point. All integers
+    are processed simultaneously, one digit at a time.
+
+    Parameters
+    ----------
+    indices : array_like
+        1-D array of non-negative integers.
+    base : int
+        The base of the digit expansion.
+    permutation : array_like, optional
+        Permutation of the digits ``0, ..., base - 1`` that is applied to
+        each digit. It must map 0 to 0.
+
+    Returns
+    -------
+    numpy array
+        The radical inverses in [0, 1).
+    """
+    quotient = np.asarray(indices)
+    assert np.all(quotient >= 0)
+    # the division is faster for narrow integer types
+    if len(quotient) == 0 or quotient.max() < 2 ** 32:
+        quotient = quotient.astype(np.uint32)
+    else:
+        quotient = quotient.astype(np.uint64)
+    if permutation is not None:
+        permutation = np.asarray(permutation)
+        assert permutation[0] == 0
+    base = int(base)
+    digit_type = np.uint8 if base <= 2 ** 8 else np.uint32
+    digits = []
+    while np.any(quotient > 0):
+        quotient, remainder = np.divmod(quotient, base)
+        digits.append(remainder.astype(digit_type))
+    # Horner's scheme, starting with the highest digit
+    result = np.zeros(len(quotient))
+    for remainder in reversed(digits):
+        if permutation is not None:
+            remainder = permutation[remainder]
+        result = (remainder + result) / base
+    return result
+
+
+def _digit_permutation(base, scramble):
+    """Permutation of the digits for a scrambled Halton sequence, or None."""
+    if scramble == "reverse":
+        return (base - np.arange(base)) % base
+    elif scramble == "random":
+        return np.r_[0, np.random.permutation(np.arange(1, base))]
+    elif scramble is None:
+        return None
+    raise ValueError("Unknown scramble '" + str(scramble) + "'")
+
+
+def sample_halton(num_points, dimension, skip=20, scramble=None):
     """Generate a Halton point set.
 
     Low discrepency quasi-random sequence using the Van der Corput sequence with the
     first `dimension` prime numbers as base.
 
+    In high dimensions, the coordinates for large bases are strongly
+    correlated for the first points. Permuting the digits removes these
+    correlations.
+
     Parameters
     ----------
     num_points : int
@@ -54,37 +236,147 @@ def sample_halton(num_points, dimension, skip=20):
         The dimension of the space.
     skip : int, optional
         The first `skip` points of the sequence will be left out.
+    scramble : str, optional
+        Permutation of the digits, must be one of (None, "reverse",
+        "random"). "reverse" maps each nonzero digit `d` to ``base - d``
+        [Vandewoestyne2006]_, "random" uses a random permutation of the
+        nonzero digits for each dimension. Default is no permutation.
 
     Returns
     -------
     points : (`num_points`, `dimension`) numpy array
+
+    References
+    ----------
+    .. [Vandewoestyne2006] Vandewoestyne, B.; Cools, R. (2006). Good
+        permutations for deterministic scrambled Halton sequences in terms
+        of L2-discrepancy. Journal of Computational and Applied Mathematics,
+        Vol. 189, No. 1-2, pp. 341-361.
+        https://dx.doi.org/10.1016/j.cam.2005.05.022
     """
+    if scramble not in (None, "reverse", "random"):
+        raise ValueError("Unknown scramble '" + str(scramble) + "'")
+    indices = np.arange(skip + 1, skip + num_points + 1)
+    points = np.empty((num_points, dimension))
+    for d, base in enumerate(_first_primes(dimension)):
+        permutation = _digit_permutation(base, scramble)
+        points[:, d] = _radical_inverse(indices, base, permutation)
+    return points
 
-    def van_der_corput(num_points, base, skip=0):
-        sequence = []
-        for i in range(skip + 1, skip + num_points + 1):
-            nth_number = 0
-            denom = 1.0
-            quotient = i
-            while quotient > 0:
-                quotient, remainder = divmod(quotient, base)
-                denom *= base
-                nth_number += remainder / denom
-            sequence.append(nth_number)
-        return sequence
-
-    # select at least as many primes as there are dimensions
-    bases = [2, 3, 5, 7, 11, 13, 17, 19, 23, 29, 31, 37, 41, 43, 47, 53, 59, 61, 67, 71]
-    bases += [73, 79, 83, 89, 97, 101, 103, 107, 109, 113, 127, 131, 137, 139, 149, 151]
-    bases += [157, 163, 167, 173, 179, 181, 191, 193, 197, 199, 211, 223, 227, 229, 233]
-    while len(bases) < dimension:
-        b = bases[-1] + 2
-        while np.any(b % np.array(bases) == 0):  # while not prime
-            b += 2
-        bases.append(b)
-
-    points = [van_der_corput(num_points, bases[d], skip=skip) for d in range(dimension)]
-    return np.array(points).T
+
+class HaltonStream:
+    """Stateful generator of successive batches of Halton points.
+
+    The stream stores the digit expansion of the next index in all bases,
+    together with the radical inverses of its higher digits. Like an
+    odometer, the expansions of the following indices are obtained by
+    adding to the lowest digit and propagating the carries, which is done
+    for a whole batch at once. Only the low digits that are reached by the
+    carries are processed, and the unchanged higher digits contribute a
+    stored constant for each dimension. Thus, appending `n` points costs
+    about ``O(n log n)`` instead of ``O(n log(index))`` operations in each
+    dimension. The points are identical to those of :func:`sample_halton`,
+    and the stream can be pickled to checkpoint its state.
+
+    Parameters
+    ----------
+    dimension : int
+        The dimension of the space.
+    skip : int, optional
+        The first `skip` points of the sequence will be left out.
+    scramble : str, optional
+        Permutation of the digits, see :func:`sample_halton`. Random
+        permutations are drawn once and kept for the whole stream.
+    """
+
+    def __init__(self, dimension, skip=20, scramble=None):
+        assert dimension > 0
+        self.dimension = dimension
+        self._bases = _first_primes(dimension)
+        self._permutations = None
+        if scramble is not None:
+            # table of the permutations of all dimensions, padded to the largest base
+            self._permutations = np.zeros((dimension, self._bases[-1]), dtype=int)
+            for d, base in enumerate(self._bases):
+                self._permutations[d, :base] = _digit_permutation(base, scramble)
+        self.jump(skip + 1)
+
+    def jump(self, index):
+        """Continue the stream at the point with the given index."""
+        assert index >= 0
+        self.index = index
+        digits = []
+        quotient = np.full(self.dimension, index, dtype=np.int64)
+        while np.any(quotient > 0):
+            quotient, remainder = np.divmod(quotient, self._bases)
+            digits.append(remainder)
+        # one row of digits per position, starting with the lowest
+        self._digits = np.array(digits, dtype=np.int64).reshape(-1, self.dimension)
+        self._tails = np.zeros((len(self._digits) + 1, self.dimension))
+        self._update_tails(len(self._digits))
+
+    def _permute(self, columns, digits):
+        """Apply the digit permutations of the given dimensions."""
+        if self._permutations is None:
+            return digits
+        return self._permutations[columns, digits]
+
+    def _update_tails(self, num_positions):
+        """Recompute the radical inverses of the digits from each low position up."""
+        columns = np.arange(self.dimension)
+        for position in reversed(range(num_positions)):
+            digits = self._permute(columns, self._digits[position])
+            self._tails[position] = (digits + self._tails[position + 1]) / self._bases
+
+    def sample(self, num_points=1):
+        """Return the next `num_points` points and advance the stream.
+
+        Returns
+        -------
+        points : (`num_points`, `dimension`) numpy array
+        """
+        # the last row yields the expansion of the next index
+        carry = np.arange(num_points + 1)[:, None]
+        columns = np.arange(self.dimension)
+        # the number of low positions reached by the carries in each dimension
+        num_positions = np.zeros(self.dimension, dtype=int)
+        low_digits = []
+        position = 0
+        while len(columns) > 0:
+            if position == len(self._digits):
+                self._digits = np.vstack(
+                    [self._digits, np.zeros((1, self.dimension), dtype=np.int64)]
+                )
+            digits = carry + self._digits[position, columns]
+            carry, digits = np.divmod(digits, self._bases[columns])
+            low_digits.append((columns, digits))
+            num_positions[columns] = position + 1
+            # dimensions without carry keep their higher digits
+            active = np.flatnonzero(carry.any(axis=0))
+            columns = columns[active]
+            carry = carry[:, active]
+            position += 1
+        if len(self._tails) <= len(self._digits):
+            # new leading zeros
+            tails = np.zeros((len(self._digits) + 1, self.dimension))
+            tails[: len(self._tails)] = self._tails
+            self._tails = tails
+        # Horner's scheme, starting with the unchanged higher digits
+        points = np.empty((num_points + 1, self.dimension))
+        points[:] = self._tails[num_positions, np.arange(self.dimension)]
+        for columns, digits in reversed(low_digits):
+            permuted = self._permute(columns, digits)
+            points[:, columns] = (permuted + points[:, columns]) / self._bases[columns]
+        for position, (columns, digits) in enumerate(low_digits):
+            self._digits[position, columns] = digits[-1]
+        self._update_tails(len(low_digits))
+        self.index += num_points
+        return points[:-1]
+
+
+def _nearest_image(points, reference):
+    """Periodic images of `points` on the unit torus closest to `reference`."""
+    return points + np.round(reference - points)
 
 
 def sample_k_means(
@@ -94,6 +386,7 @@ def sample_k_means(
     initial_points=None,
     dist_args={},
     callback=None,
+    batch_size=None,
 ):
     """MacQueen's method.
 
@@ -101,6 +394,12 @@ def sample_k_means(
     tesselation of the unit hypercube. Further information is given in
     [MacQueen1967]_.
 
+    In the mini-batch mode, a block of random points is assigned to the
+    cluster centers at once. Then each center moves to the weighted mean
+    of itself and all its assigned points, which is the same as MacQueen's
+    update for these points one after another, except that the assignment
+    is not updated in between. This is much faster for many points.
+
     Parameters
     ----------
     num_points : int
@@ -118,6 +417,9 @@ def sample_k_means(
     callback : callable, optional
         If provided, it is called in each iteration with the current point
         set as argument for monitoring progress.
+    batch_size : int, optional
+        If given, the random points are drawn in blocks of this size, and
+        `num_steps` is the total number of random points.
 
     Returns
     -------
@@ -145,25 +447,47 @@ def sample_k_means(
         assert np.all(cluster_centers <= 1.0)
     else:
         raise ValueError("len(initial_points) must be equal to num_points")
+    wrap = dist_args.get("max_dist", None) is not None
+    if batch_size is not None:
+        assert batch_size > 0
+        weights = np.ones(num_points)
+        for start in range(0, num_steps, batch_size):
+            if callback is not None:
+                callback(cluster_centers)
+            current_batch_size = min(batch_size, num_steps - start)
+            sample_points = np.random.rand(current_batch_size, dimension)
+            nearest_indices = reduce_distances(
+                sample_points, cluster_centers, "argmin", exact=False, **dist_args
+            )
+            if wrap:
+                sample_points = _nearest_image(
+                    sample_points, cluster_centers[nearest_indices]
+                )
+            sums = cluster_centers * weights[:, None]
+            np.add.at(sums, nearest_indices, sample_points)
+            weights += np.bincount(nearest_indices, minlength=num_points)
+            cluster_centers = sums / weights[:, None]
+            if wrap:
+                cluster_centers %= 1.0
+            assert np.all(cluster_centers <= 1.0)
+            assert np.all(cluster_centers >= 0.0)
+        return cluster_centers
     weights = [1.0] * num_points
+    # squared Euclidean distances suffice for finding the nearest center
+    squared = dist_args.get("norm", 2) == 2
     # begin iteration
     for _ in range(num_steps):
         if callback is not None:
             callback(cluster_centers)
         sample_point = np.random.rand(1, dimension)
-        distances = distance_matrix(sample_point, cluster_centers, **dist_args)
+        distances = distance_matrix(
+            sample_point, cluster_centers, squared=squared, exact=False, **dist_args
+        )
         sample_point = sample_point.ravel()
-        nearest_index = int(np.argmin(distances, axis=1))
+        nearest_index = int(np.argmin(distances))
         nearest_cluster_center = cluster_centers[nearest_index, :].ravel()
-        if dist_args.get("max_dist", None) is not None:
-            one_dim_dists = np.abs(nearest_cluster_center - sample_point)
-            virtual_point = np.array(sample_point)
-            for j, dist in enumerate(one_dim_dists):
-                if dist > 0.5:
-                    if nearest_cluster_center[j] < 0.5:
-                        virtual_point[j] = 1.0 - sample_point[j]
-                    else:
-                        virtual_point[j] = 1.0 + sample_point[j]
+        if wrap:
+            virtual_point = _nearest_image(sample_point, nearest_cluster_center)
         else:
             virtual_point = sample_point
         weight = weights[nearest_index]
@@ -177,6 +501,117 @@ def sample_k_means(
     return cluster_centers
 
 
+def sample_cvt(
+    num_points,
+    dimension,
+    num_iterations=100,
+    num_cloud_points=None,
+    cloud="sobol",
+    tol=1e-6,
+    initial_points=None,
+    dist_args={},
+    callback=None,
+):
+    """Lloyd's algorithm for centroidal Voronoi tessellations.
+
+    This algorithm was presented in [Lloyd1982]_. In each iteration, a large
+    cloud of points is assigned to the nearest centers, and each center is
+    moved to the centroid of its cloud points, which approximates the
+    centroid of its Voronoi cell. In contrast to :func:`sample_k_means`, all
+    centers are updated at once, and the assignment is computed tile by
+    tile, using several threads if configured with
+    :func:`set_num_threads <diversipy.distance.set_num_threads>`.
+
+    Parameters
+    ----------
+    num_points : int
+        The number of points to generate.
+    dimension : int
+        The dimension of the space.
+    num_iterations : int, optional
+        The maximal number of iterations.
+    num_cloud_points : int, optional
+        The size of the cloud. Default is ``100 * num_points``.
+    cloud : str, optional
+        The type of the cloud, one of ("sobol", "halton", "random"). A
+        quasi-random cloud is generated once, while a random cloud is drawn
+        anew in each iteration.
+    tol : float, optional
+        The iteration stops as soon as no center moves farther than this.
+    initial_points : array_like, optional
+        The point set to improve (if None, a sample is drawn with
+        :func:`stratified_sampling`).
+    dist_args : dict, optional
+        Arguments for the distance calculation. If `max_dist` is given, the
+        unit hypercube is treated as torus.
+    callback : callable, optional
+        If provided, it is called in each iteration with the current point
+        set as argument for monitoring progress.
+
+    Returns
+    -------
+    centers : (`num_points`, `dimension`) numpy array
+
+    References
+    ----------
+    .. [Lloyd1982] Lloyd, S. (1982). Least squares quantization in PCM.
+        IEEE Transactions on Information Theory, Vol. 28, No. 2, pp. 129-137.
+        https://dx.doi.org/10.1109/TIT.1982.1056489
+    """
+    if num_cloud_points is None:
+        num_cloud_points = 100 * num_points
+    if cloud == "sobol":
+        cloud_points = sobol.sample(dimension, num_cloud_points)
+    elif cloud == "halton":
+        cloud_points = sample_halton(num_cloud_points, dimension)
+    elif cloud != "random":
+        raise ValueError("Unknown cloud '" + str(cloud) + "'")
+    if initial_points is None:
+        centers = sample_from_strata(stratify_generalized(num_points, dimension))
+    elif len(initial_points) == num_points:
+        centers = np.array(initial_points, dtype=float)
+        assert np.all(centers >= 0.0)
+        assert np.all(centers <= 1.0)
+    else:
+        raise ValueError("len(initial_points) must be equal to num_points")
+    wrap = dist_args.get("max_dist", None) is not None
+    for _ in range(num_iterations):
+        if callback is not None:
+            callback(centers)
+        if cloud == "random":
+            cloud_points = np.random.rand(num_cloud_points, dimension)
+        nearest_indices = reduce_distances(
+            cloud_points, centers, "argmin", exact=False, **dist_args
+        )
+        cell_points = cloud_points
+        if wrap:
+            cell_points = _nearest_image(cloud_points, centers[nearest_indices])
+        sums = np.zeros_like(centers)
+        np.add.at(sums, nearest_indices, cell_points)
+        counts = np.bincount(nearest_indices, minlength=num_points)
+        # centers without cloud points stay where they are
+        nonempty = counts > 0
+        new_centers = np.array(centers)
+        new_centers[nonempty] = sums[nonempty] / counts[nonempty, None]
+        movement = np.abs(new_centers - centers).max()
+        if wrap:
+            new_centers %= 1.0
+        centers = new_centers
+        if movement <= tol:
+            break
+    return centers
+
+
+def _maximin_fixed_dists(points, existing_index, boundary_factor):
+    """Distances of points to the existing points and the relaxed boundary."""
+    dists = np.full(len(points), np.inf)
+    if existing_index is not None:
+        dists = existing_index.query(points)[0]
+    if boundary_factor is not None:
+        dists = np.minimum(dists, boundary_factor * distance_to_boundary(points))
+    return dists
+
+
 def sample_maximin(
     num_points,
     dimension,
@@ -186,6 +621,7 @@ def sample_maximin(
     use_reflection_edge_correction=False,
     dist_args={"norm": 1, "max_dist": 1},
     callback=None,
+    batch_size=None,
 ):
     """Maximize the minimal distance in the unit hypercube with extensions.
 
@@ -194,6 +630,13 @@ def sample_maximin(
     in the set, 2) existing (fixed) points, and 3) the boundary of the
     hypercube. Details can be found in [Wessing2015]_.
 
+    The point to be replaced is always the one with the smallest distance.
+    The nearest-neighbor distances of all points are kept in a heap and
+    updated locally when a point moves.
+
+    In the batch mode, a block of random proposals is evaluated at once, and
+    the best of them replaces the removal candidate if it is good enough.
+
     Parameters
     ----------
     num_points : int
@@ -218,6 +661,9 @@ def sample_maximin(
     callback : callable, optional
         If provided, it is called in each iteration with the current point
         set as argument for monitoring progress.
+    batch_size : int, optional
+        If given, the proposals are drawn in blocks of this size, and
+        `num_steps` is the total number of proposals.
 
     Returns
     -------
@@ -234,6 +680,9 @@ def sample_maximin(
     assert num_points > 0
     if num_steps is None:
         num_steps = 100 * num_points
+    if batch_size is None:
+        batch_size = 1
+    assert batch_size > 0
     if initial_points is None:
         points = sample_from_strata(stratify_generalized(num_points, dimension))
     elif len(initial_points) == num_points:
@@ -253,88 +702,96 @@ def sample_maximin(
         np.zeros(dimension), 0.5 * np.ones(dimension), **dist_args
     )[0, 0]
     norm_of_one_vector *= 2
-    remaining_indices = list(range(num_points))
-    random.shuffle(remaining_indices)
-    removal_candidate_index = remaining_indices.pop()
-    removal_candidate = points[removal_candidate_index]
-    # initial distance calculations
-    distances = distance_matrix(removal_candidate, points, **dist_args)[0]
-    distances[removal_candidate_index] = np.inf
-    current_dist = distances.min()
+    # nearest-neighbor queries in logarithmic time
+    norm = dist_args.get("norm", 2)
+    max_dist = dist_args.get("max_dist", None)
+    index = SpatialIndex(points, norm=norm, max_dist=max_dist)
+    existing_index = None
     if num_existing_points > 0:
-        dists_to_existing_points = distance_matrix(
-            removal_candidate, existing_points, **dist_args
-        )[0]
-        current_dist = min(current_dist, dists_to_existing_points.min())
+        existing_index = SpatialIndex(existing_points, norm=norm, max_dist=max_dist)
+    boundary_factor = None
     if use_reflection_edge_correction:
         # compare with 2 * ||1|| * (distance to nearest boundary)
-        relaxed_boundary_dist = (
-            2 * norm_of_one_vector * distance_to_boundary(removal_candidate)
-        )
-        current_dist = min(current_dist, relaxed_boundary_dist)
+        boundary_factor = 2 * norm_of_one_vector
+    # initial distance calculations
+    point_dists, nn_indices = index.query(points, exclude=np.arange(num_points))
+    fixed_dists = _maximin_fixed_dists(points, existing_index, boundary_factor)
+    min_dists = np.minimum(point_dists, fixed_dists)
+    # reverse_nn[j] holds all points whose nearest neighbor is point j
+    reverse_nn = [set() for _ in range(num_points)]
+    for i, j in enumerate(nn_indices):
+        if j >= 0:
+            reverse_nn[j].add(i)
+    # heap of minimal distances, outdated entries are skipped lazily
+    heap = list(zip(min_dists.tolist(), range(num_points)))
+    heapq.heapify(heap)
     # maximize minimal distance
-    for _ in range(num_steps):
+    for start in range(0, num_steps, batch_size):
         if callback is not None:
             callback(points)
-        new_point = np.random.rand(1, dimension)
-        new_dist = np.inf
+        # the removal candidate is the point with the smallest distance
+        while heap[0][0] != min_dists[heap[0][1]]:
+            heapq.heappop(heap)
+        current_dist, removal_candidate_index = heap[0]
+        current_batch_size = min(batch_size, num_steps - start)
+        new_points = np.random.rand(current_batch_size, dimension)
+        new_dists = np.full(current_batch_size, np.inf)
         if use_reflection_edge_correction:
-            # compare with 2 * ||1|| * (distance to nearest boundary)
-            relaxed_boundary_dist = (
-                2 * norm_of_one_vector * distance_to_boundary(new_point)
-            )
-            new_dist = relaxed_boundary_dist
-        if new_dist >= current_dist:
-            distances = distance_matrix(new_point, points, **dist_args)[0]
-            distances[removal_candidate_index] = np.inf
-            new_dist = min(new_dist, distances.min())
-            if new_dist >= current_dist and num_existing_points > 0:
-                dists_to_existing_points = distance_matrix(
-                    new_point, existing_points, **dist_args
-                )[0]
-                new_dist = min(new_dist, dists_to_existing_points.min())
-        if new_dist >= current_dist:
-            # accept new point
-            points[removal_candidate_index] = new_point
-            current_dist = new_dist
-            removal_candidate = new_point
-            # removal_candidate_index stays the same, but reset other indices
-            remaining_indices = list(range(num_points))
-            remaining_indices.remove(removal_candidate_index)
-            random.shuffle(remaining_indices)
-        else:
-            # failed to find better point in this iteration
-            if remaining_indices:
-                # carry out one attempt to find new removal candidate
-                removal_candidate_candidate_index = remaining_indices.pop()
-                removal_candidate_candidate = points[removal_candidate_candidate_index]
-                # calculate minimal distance
-                distances = distance_matrix(
-                    removal_candidate_candidate, points, **dist_args
-                )[0]
-                distances[removal_candidate_candidate_index] = np.inf
-                candidate_candidate_dist = distances.min()
-                if num_existing_points > 0:
-                    dists_to_existing_points = distance_matrix(
-                        removal_candidate_candidate, existing_points, **dist_args
-                    )[0]
-                    candidate_candidate_dist = min(
-                        candidate_candidate_dist, dists_to_existing_points.min()
-                    )
-                if use_reflection_edge_correction:
-                    # compare with 2 * ||1|| * (distance to nearest boundary)
-                    relaxed_boundary_dist = 2.0 * norm_of_one_vector
-                    relaxed_boundary_dist *= distance_to_boundary(
-                        removal_candidate_candidate
-                    )
-                    candidate_candidate_dist = min(
-                        candidate_candidate_dist, relaxed_boundary_dist
-                    )
-                if candidate_candidate_dist <= current_dist:
-                    # found new removal candidate
-                    removal_candidate = removal_candidate_candidate
-                    current_dist = candidate_candidate_dist
-                    removal_candidate_index = removal_candidate_candidate_index
+            new_dists = boundary_factor * distance_to_boundary(new_points)
+        # only proposals that are still good enough need further distances
+        candidates = np.flatnonzero(new_dists >= current_dist)
+        if len(candidates) > 0:
+            nn_dists = index.query(
+                new_points[candidates], exclude=removal_candidate_index
+            )[0]
+            new_dists[candidates] = np.minimum(new_dists[candidates], nn_dists)
+            candidates = candidates[new_dists[candidates] >= current_dist]
+            if len(candidates) > 0 and num_existing_points > 0:
+                nn_dists = existing_index.query(new_points[candidates])[0]
+                new_dists[candidates] = np.minimum(new_dists[candidates], nn_dists)
+        best_index = np.argmax(new_dists)
+        new_point = new_points[best_index]
+        if new_dists[best_index] < current_dist:
+            continue
+        # accept new point
+        moved_index = removal_candidate_index
+        points[moved_index] = new_point
+        index.update(moved_index, new_point)
+        fixed_dists[moved_index] = _maximin_fixed_dists(
+            new_point[None], existing_index, boundary_factor
+        )[0]
+        # the moved point and those that had it as nearest neighbor need a
+        # new nearest neighbor
+        changed = np.array(sorted(reverse_nn[moved_index] | {moved_index}))
+        changed_dists, changed_nn = index.query(points[changed], exclude=changed)
+        updates = list(zip(changed, changed_dists, changed_nn))
+        # points that are closer to the new point than to their nearest
+        # neighbor are found among its nearest neighbors
+        num_others = num_points - 1
+        k = min(2 * dimension, num_others)
+        while k > 0:
+            dists, ids = index.query(new_point, k=k, exclude=moved_index)
+            dists = dists.ravel()
+            ids = ids.ravel()
+            if k == num_others or dists[-1] >= point_dists.max():
+                break
+            k = min(2 * k, num_others)
+        if k > 0:
+            closer = dists < point_dists[ids]
+            for i, dist in zip(ids[closer], dists[closer]):
+                updates.append((i, dist, moved_index))
+        for i, dist, j in updates:
+            if nn_indices[i] >= 0:
+                reverse_nn[nn_indices[i]].discard(i)
+            if j >= 0:
+                reverse_nn[j].add(i)
+            nn_indices[i] = j
+            point_dists[i] = dist
+            min_dists[i] = min(dist, fixed_dists[i])
+            heapq.heappush(heap, (min_dists[i], i))
+        if len(heap) > 4 * num_points:
+            heap = list(zip(min_dists.tolist(), range(num_points)))
+            heapq.heapify(heap)
     return points
 
 
@@ -900,10 +1357,14 @@ def improved_latin_design(
         for dim in dimensions:
             candidates[:, dim] = permutation(candidates[:, dim])
         # calculate distances to already chosen points
-        distances = distance_matrix(
-            design[0:i, :], candidates[0:num_candidates, :], **dist_args
+        min_dists = reduce_distances(
+            design[0:i, :],
+            candidates[0:num_candidates, :],
+            "min",
+            axis=0,
+            exact=False,
+            **dist_args
         )
-        min_dists = distances.min(axis=0)
         # select best point according to distance criterion
         if not np.isinf(target_value):
             selected_index = np.argmin(np.abs(min_dists - target_value))
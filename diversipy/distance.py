@@ -1,12 +1,136 @@
 """
 This module provides distance helper functions.
+
+The distance computations are carried out tile by tile, so that
+temporary arrays stay within a memory budget and inputs can also be
+memory-mapped arrays (:class:`numpy.memmap`) larger than the main memory.
+Tiles can be processed by several threads. Both the budget and the number
+of threads are package-wide options, which can be changed with
+:func:`set_options` (or :func:`set_num_threads`) or temporarily with the
+context manager :func:`options`. Results do not depend on the number of
+threads.
+
+Another option is the floating point type of the computations. By default,
+the common type of the inputs is used (at least float64 for integer
+inputs). With ``set_options(dtype=np.float32)``, all distances are computed
+in single precision instead, which halves the memory traffic. This is
+usually sufficient to compare distances, e.g., for subset selection.
 """
 
+import collections
+import contextlib
+from concurrent.futures import ThreadPoolExecutor
 import numpy as np
+from scipy.spatial import cKDTree
 import diversipy
 
+BLOCK_BYTES = 2 ** 26  # default memory budget for temporary arrays (64 MiB)
+
+_options = {"num_threads": 1, "block_bytes": BLOCK_BYTES, "dtype": None}
+_executor = None
+_executor_threads = 0
+
+
+def get_options():
+    """Return a copy of the current package-wide options."""
+    return dict(_options)
+
+
+def set_options(**new_options):
+    """Change package-wide options.
+
+    Parameters
+    ----------
+    num_threads : int, optional
+        The number of threads used for distance computations.
+    block_bytes : int, optional
+        Memory budget for the temporary arrays of one tile, which is used
+        whenever a function is called without explicit `block_bytes`. For
+        memory-mapped inputs, this is also the size of the chunks that are
+        read sequentially from disk.
+    dtype : data-type, optional
+        Floating point type of distance computations, which is used whenever
+        a function is called without explicit `dtype`. None (the default)
+        means the common type of the inputs, but at least float64 for
+        integer inputs. Note that with float32, the matrix multiplication
+        used for Euclidean distances with ``exact=False`` has an absolute
+        error of roughly ``sqrt(eps) * |x|`` (with ``eps`` about 1.2e-7),
+        which is large for points with large coordinates.
+    """
+    for name, value in new_options.items():
+        if name not in _options:
+            raise ValueError("Unknown option '" + name + "'")
+        if name in ("num_threads", "block_bytes") and value < 1:
+            raise ValueError(name + " must be at least 1")
+        if name == "dtype" and value is not None:
+            if not np.issubdtype(value, np.floating):
+                raise ValueError("dtype must be a floating point type")
+            new_options[name] = np.dtype(value)
+    _options.update(new_options)
+
+
+@contextlib.contextmanager
+def options(**new_options):
+    """Context manager temporarily changing package-wide options.
+
+    Accepts the same arguments as :func:`set_options`.
+    """
+    old_options = get_options()
+    set_options(**new_options)
+    try:
+        yield
+    finally:
+        _options.update(old_options)
+
+
+def set_num_threads(num_threads):
+    """Set the number of threads used for distance computations."""
+    set_options(num_threads=num_threads)
+
+
+def get_num_threads():
+    """Return the number of threads used for distance computations."""
+    return _options["num_threads"]
+
+
+def _compute_dtype(dtype, *arrays):
+    """Return the floating point type to compute distances between `arrays` in."""
+    if dtype is None:
+        dtype = _options["dtype"]
+    if dtype is None:
+        return np.result_type(*arrays, 1.0)
+    if not np.issubdtype(dtype, np.floating):
+        raise ValueError("dtype must be a floating point type")
+    return np.dtype(dtype)
 
-def distance_to_boundary(points, cuboid=None):
+
+def _parallel_map(function, items):
+    """Lazily apply `function` to `items`, yielding results in order.
+
+    With more than one thread, a bounded number of items is processed ahead
+    by a thread pool, so that memory requirements stay limited.
+    """
+    global _executor, _executor_threads
+    num_threads = _options["num_threads"]
+    if num_threads == 1 or len(items) < 2:
+        for item in items:
+            yield function(item)
+        return
+    if _executor_threads != num_threads:
+        if _executor is not None:
+            _executor.shutdown()
+        _executor = ThreadPoolExecutor(num_threads)
+        _executor_threads = num_threads
+    pending = collections.deque()
+    for item in items:
+        pending.append(_executor.submit(function, item))
+        if len(pending) >= 2 * num_threads:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+def distance_to_boundary(points, cuboid=None, block_bytes=None):
     """Calculate the distance of each point to the boundary of some cuboid.
 
     This distance is simply the minimum of all differences between
@@ -21,25 +145,228 @@ def distance_to_boundary(points, cuboid=None):
     cuboid : tuple of array_like, optional
         Contains the min and max bounds of the considered cuboid. If
         omitted, the unit hypercube is assumed.
+    block_bytes : int, optional
+        The points are processed in chunks of this size. Default is the
+        package-wide option, see :func:`set_options`.
 
     Returns
     -------
     distances : numpy array
         1-D array of `n` distances
     """
+    points = np.atleast_2d(points)
     if cuboid is None:
         cuboid = diversipy.cube.unitcube(points.shape[1])
+    if block_bytes is None:
+        block_bytes = _options["block_bytes"]
     min_bounds, max_bounds = cuboid
-    dists_to_min_bounds = (points - np.asarray(min_bounds)).min(axis=1)
-    dists_to_max_bounds = (np.asarray(max_bounds) - points).min(axis=1)
-    distances = np.minimum(dists_to_min_bounds, dists_to_max_bounds)
+    min_bounds = np.asarray(min_bounds)
+    max_bounds = np.asarray(max_bounds)
+    distances = np.empty(len(points), dtype=np.result_type(points, 1.0))
+    row_bytes = points.shape[1] * points.itemsize
+    for rows, _ in _tiles(len(points), 1, row_bytes, block_bytes):
+        chunk = points[rows]
+        dists_to_min_bounds = (chunk - min_bounds).min(axis=1)
+        dists_to_max_bounds = (max_bounds - chunk).min(axis=1)
+        distances[rows] = np.minimum(dists_to_min_bounds, dists_to_max_bounds)
     assert np.all(distances >= 0.0)  # are all points contained in cuboid?
     return distances
 
 
-def distance_matrix(points1, points2, norm=2, max_dist=None):
+def distance_to_polytope_boundary(points, A, b, row_norms=None, block_bytes=None):
+    """Calculate the distance of each point to the boundary of a polytope.
+
+    For a point inside the convex polytope :math:`Ax \\leq b`, the distance
+    to the boundary is the minimum of the distances to the hyperplanes of
+    all constraints, ``(b_i - A_i x) / ||A_i||``. The points are processed in
+    chunks, each with a single matrix product. Like
+    :func:`distance_to_boundary`, this function checks that all points are
+    contained in the polytope.
+
+    Parameters
+    ----------
+    points : array_like
+        2-D array of `n` points.
+    A : 2d-array of shape (n_constraints, dimension)
+        Left-hand-side of Ax <= b.
+    b : 1d-array of shape (n_constraints)
+        Right-hand-side of Ax <= b.
+    row_norms : 1d-array of shape (n_constraints), optional
+        Euclidean norms of the rows of `A`. Can be provided to avoid their
+        recomputation in repeated calls.
+    block_bytes : int, optional
+        The points are processed in chunks of this size. Default is the
+        package-wide option, see :func:`set_options`.
+
+    Returns
+    -------
+    distances : numpy array
+        1-D array of `n` distances
+    """
+    points = np.atleast_2d(points)
+    A = np.asarray(A, dtype=float)
+    b = np.asarray(b, dtype=float)
+    assert A.shape == (len(b), points.shape[1])
+    if row_norms is None:
+        row_norms = np.linalg.norm(A, axis=1)
+    if block_bytes is None:
+        block_bytes = _options["block_bytes"]
+    # scale constraints to unit normal vectors once
+    A = A / row_norms[:, None]
+    b = b / row_norms
+    distances = np.empty(len(points))
+    for rows, _ in _tiles(len(points), 1, len(b) * A.itemsize, block_bytes):
+        distances[rows] = (b - points[rows] @ A.T).min(axis=1)
+    assert np.all(distances >= 0.0)  # are all points contained in polytope?
+    return distances
+
+
+def _tiles(num_rows, num_cols, pair_bytes, block_bytes, point_bytes=0):
+    """Yield (row slice, column slice) pairs covering a `num_rows` x `num_cols` matrix.
+
+    The tiles are chosen so that a temporary array of `pair_bytes` per
+    matrix entry, plus `point_bytes` per row and per column (e.g., for the
+    coordinates of the points), stays within `block_bytes`. The longer axis
+    is traversed in the outer loop and the shorter one is only split if it
+    exceeds the budget. Thus, the larger point set is read sequentially and, if the
+    smaller one fits into a tile, only once.
+    """
+    if num_cols > num_rows:
+        for cols, rows in _tiles(
+            num_cols, num_rows, pair_bytes, block_bytes, point_bytes
+        ):
+            yield rows, cols
+        return
+    pair_bytes = max(int(pair_bytes), 1)
+    cols_per_tile = int(block_bytes // (pair_bytes + point_bytes))
+    cols_per_tile = max(1, min(num_cols, cols_per_tile))
+    row_bytes = cols_per_tile * pair_bytes + point_bytes
+    rows_per_tile = (block_bytes - cols_per_tile * point_bytes) // row_bytes
+    rows_per_tile = max(1, int(rows_per_tile))
+    for row_start in range(0, num_rows, rows_per_tile):
+        rows = slice(row_start, min(row_start + rows_per_tile, num_rows))
+        for col_start in range(0, num_cols, cols_per_tile):
+            yield rows, slice(col_start, min(col_start + cols_per_tile, num_cols))
+
+
+def _distance_tile(points1, points2, norm, max_dist, squared):
+    """Distances between two (small) point sets via a 3-D difference tensor."""
+    diff = points1[:, None, :] - points2[None, :, :]
+    if max_dist is not None:
+        diff = np.abs(diff)
+        diff = np.minimum(diff, max_dist - diff)
+        assert (diff >= 0).all()  # are all points inside the cuboid?
+    if squared and norm == 2:
+        return np.einsum("ijk,ijk->ij", diff, diff)
+    distances = np.linalg.norm(diff, axis=-1, ord=norm)
+    if squared:
+        distances **= 2
+    return distances
+
+
+def _sq_euclidean_tile(points1, points2, sq_norms1, sq_norms2):
+    """Squared Euclidean distances via ``|x|^2 + |y|^2 - 2 x.y``."""
+    sq_dists = points1 @ points2.T
+    sq_dists *= -2.0
+    sq_dists += sq_norms1[:, None]
+    sq_dists += sq_norms2[None, :]
+    # clamp negative values caused by round-off
+    np.maximum(sq_dists, 0.0, out=sq_dists)
+    return sq_dists
+
+
+def _iter_distance_tiles(
+    points1,
+    points2,
+    norm,
+    max_dist,
+    squared,
+    block_bytes,
+    exact=False,
+    tile_function=None,
+    dtype=None,
+):
+    """Yield (row slice, column slice, distances) for tiles of the distance matrix.
+
+    For Euclidean distance without wrapping, each tile is obtained from a
+    single matrix multiplication, unless `exact` is True. Otherwise, the
+    difference tensor of the tile is built explicitly. If `tile_function`
+    is given, it is applied to the distances of each tile (in the worker
+    thread) and its result is yielded instead. The points are converted to
+    `dtype` tile by tile, so that memory-mapped inputs are never copied as
+    a whole.
+    """
+    if block_bytes is None:
+        block_bytes = _options["block_bytes"]
+    num_points1, dimension = points1.shape
+    num_points2 = len(points2)
+    dtype = _compute_dtype(dtype, points1, points2)
+    if max_dist is not None:
+        max_dist = np.asarray(max_dist, dtype=dtype)
+    if norm == 2 and max_dist is None and not exact:
+        pair_bytes = dtype.itemsize
+
+        def compute_tile(rows, cols):
+            tile_points1 = points1[rows].astype(dtype, copy=False)
+            tile_points2 = points2[cols].astype(dtype, copy=False)
+            tile = _sq_euclidean_tile(
+                tile_points1,
+                tile_points2,
+                np.einsum("ij,ij->i", tile_points1, tile_points1),
+                np.einsum("ij,ij->i", tile_points2, tile_points2),
+            )
+            if not squared:
+                np.sqrt(tile, out=tile)
+            return tile
+
+    else:
+        pair_bytes = dimension * dtype.itemsize
+
+        def compute_tile(rows, cols):
+            return _distance_tile(
+                points1[rows].astype(dtype, copy=False),
+                points2[cols].astype(dtype, copy=False),
+                norm,
+                max_dist,
+                squared,
+            )
+
+    def process(tile_slices):
+        rows, cols = tile_slices
+        tile = compute_tile(rows, cols)
+        if tile_function is not None:
+            tile = tile_function(tile)
+        return rows, cols, tile
+
+    # the coordinates of each tile are read and converted as well
+    point_bytes = dimension * dtype.itemsize
+    tiles = list(
+        _tiles(num_points1, num_points2, pair_bytes, block_bytes, point_bytes)
+    )
+    return _parallel_map(process, tiles)
+
+
+def distance_matrix(
+    points1,
+    points2,
+    norm=2,
+    max_dist=None,
+    squared=False,
+    block_bytes=None,
+    out=None,
+    dtype=None,
+    exact=True,
+):
     """Calculate the distance between each combination of points in two sets.
 
+    The matrix is computed tile by tile, so that the intermediate arrays
+    never exceed `block_bytes`. Only the result itself requires memory
+    proportional to ``n1 * n2``. With ``exact=False``, Euclidean distances
+    without wrapping are obtained with the expansion
+    ``|x|^2 + |y|^2 - 2 x.y``, i.e., a matrix multiplication, which is much
+    faster than explicit differences. However, it suffers from cancellation,
+    so it should only be used when distances are merely compared.
+
     Parameters
     ----------
     points1 : array_like
@@ -52,7 +379,25 @@ def distance_matrix(points1, points2, norm=2, max_dist=None):
         1-D array of largest possible distance in each dimension.
         Providing these values has the consequence of treating the cuboid as a torus.
         This is useful for eliminating edge effects induced by the lack of neighbor
-        points outside the bounds of the cuboid.d
+        points outside the bounds of the cuboid.
+    squared : bool, optional
+        If True, the squared distances are returned. This saves the square
+        root for Euclidean distance and suffices for comparisons.
+    block_bytes : int, optional
+        Memory budget for the temporary arrays of one tile. Default is the
+        package-wide option, see :func:`set_options`.
+    out : numpy array, optional
+        (`n1` x `n2`) array to write the result into.
+    dtype : data-type, optional
+        Floating point type of the computations and the result. Default is
+        the package-wide option, see :func:`set_options`. With float32 and
+        ``exact=False``, the absolute error is roughly
+        ``sqrt(eps) * |x|`` for points `x` with large coordinates.
+    exact : bool, optional
+        If True (the default), Euclidean distances are computed with
+        explicit differences, so that, e.g., identical points have a
+        distance of exactly zero. If False, the faster but less accurate
+        matrix multiplication is used.
 
     Returns
     -------
@@ -62,9 +407,574 @@ def distance_matrix(points1, points2, norm=2, max_dist=None):
     points1 = np.atleast_2d(points1)
     points2 = np.atleast_2d(points2)
     assert points1.shape[1] == points2.shape[1]
-    diff = np.expand_dims(points1, 1) - np.expand_dims(points2, 0)
+    dtype = _compute_dtype(dtype, points1, points2)
+    if out is None:
+        out = np.empty((len(points1), len(points2)), dtype=dtype)
+    assert out.shape == (len(points1), len(points2))
+    for rows, cols, tile in _iter_distance_tiles(
+        points1, points2, norm, max_dist, squared, block_bytes, exact, dtype=dtype
+    ):
+        out[rows, cols] = tile
+    return out
+
+
+def _reduce_tile_sum(tile):
+    return tile.sum(axis=1, dtype=np.float64)
+
+
+def _reduce_tile_max(tile):
+    return tile.max(axis=1)
+
+
+def _reduce_tile_argmin(tile):
+    tile_indices = tile.argmin(axis=1)
+    return tile_indices, tile[np.arange(len(tile)), tile_indices]
+
+
+def reduce_distances(
+    points1,
+    points2,
+    reduce="min",
+    axis=1,
+    norm=2,
+    max_dist=None,
+    squared=False,
+    block_bytes=None,
+    dtype=None,
+    exact=True,
+):
+    """Reduce the distance matrix of two point sets along one axis.
+
+    This is equivalent to, e.g., ``distance_matrix(points1, points2).min(axis=1)``,
+    but the matrix is never materialized. Instead, the tiles are reduced
+    as soon as they are computed, so that the memory requirement is only
+    linear in the number of points.
+
+    Parameters
+    ----------
+    points1 : array_like
+        2-D array of `n1` points.
+    points2 : array_like
+        2-D array of `n2` points.
+    reduce : str, optional
+        The reduction to apply. Must be one of ("min", "argmin", "max", "sum").
+    axis : int, optional
+        The axis of the distance matrix to reduce. 1 yields one value for
+        each point in `points1`, 0 one value for each point in `points2`.
+    norm : int, optional
+        Norm to use for the distance, by default 2 (euclidean norm).
+    max_dist : array_like, optional
+        1-D array of largest possible distance in each dimension, see
+        :func:`distance_matrix`.
+    squared : bool, optional
+        If True, the reduction is carried out on squared distances.
+    block_bytes : int, optional
+        Memory budget for the temporary arrays of one tile. Default is the
+        package-wide option, see :func:`set_options`.
+    dtype : data-type, optional
+        Floating point type of the computations and the result. Sums are
+        always accumulated in float64. Default is the package-wide option,
+        see :func:`set_options`.
+    exact : bool, optional
+        If False, Euclidean distances are computed with a faster but less
+        accurate matrix multiplication, see :func:`distance_matrix`.
+
+    Returns
+    -------
+    reduced : numpy array
+        1-D array of `n1` values if ``axis == 1``, else of `n2` values.
+    """
+    if reduce not in ("min", "argmin", "max", "sum"):
+        raise ValueError("Unknown reduction '" + str(reduce) + "'")
+    if axis not in (0, 1):
+        raise ValueError("axis must be 0 or 1")
+    points1 = np.atleast_2d(points1)
+    points2 = np.atleast_2d(points2)
+    assert points1.shape[1] == points2.shape[1]
+    if axis == 0:
+        # the distance matrix of the swapped sets is the transposed matrix
+        points1, points2 = points2, points1
+    num_points = len(points1)
+    dtype = _compute_dtype(dtype, points1, points2)
+    # only the sum needs the actual Euclidean distances, the rest works on
+    # squares, which saves the root for all but the reduced values
+    take_root = reduce != "sum" and not squared and norm == 2
+    if reduce == "sum":
+        reduced = np.zeros(num_points)
+        tile_function = _reduce_tile_sum
+    elif reduce == "max":
+        reduced = np.full(num_points, -np.inf, dtype=dtype)
+        tile_function = _reduce_tile_max
+    else:
+        reduced = np.full(num_points, np.inf, dtype=dtype)
+        indices = np.zeros(num_points, dtype=int)
+        tile_function = _reduce_tile_argmin
+    tiles = _iter_distance_tiles(
+        points1,
+        points2,
+        norm,
+        max_dist,
+        squared or take_root,
+        block_bytes,
+        exact,
+        tile_function=tile_function,
+        dtype=dtype,
+    )
+    # combine partial results in a fixed order, independent of the threads
+    for rows, cols, partial in tiles:
+        if reduce == "sum":
+            reduced[rows] += partial
+        elif reduce == "max":
+            reduced[rows] = np.maximum(reduced[rows], partial)
+        else:
+            tile_indices, tile_min = partial
+            # strict comparison keeps the first occurrence, like np.argmin
+            improved = tile_min < reduced[rows]
+            reduced[rows] = np.where(improved, tile_min, reduced[rows])
+            indices[rows] = np.where(improved, tile_indices + cols.start, indices[rows])
+    if reduce == "argmin":
+        return indices
+    if take_root:
+        np.sqrt(reduced, out=reduced)
+    return reduced
+
+
+def condensed_distance_matrix(
+    points, norm=2, max_dist=None, squared=False, block_bytes=None, dtype=None
+):
+    """Calculate the pairwise distances within one point set.
+
+    Only the upper triangle of the distance matrix is computed and stored,
+    in the same order as :func:`scipy.spatial.distance.pdist`, i.e., the
+    distance between points `i` and `j` with ``i < j`` is located at index
+    ``n * i - i * (i + 1) // 2 + j - i - 1``. The distances are computed
+    with explicit differences (also for Euclidean distance), so that
+    duplicate points have a distance of exactly zero.
+
+    Parameters
+    ----------
+    points : array_like
+        2-D array of `n` points.
+    norm : int, optional
+        Norm to use for the distance, by default 2 (euclidean norm).
+    max_dist : array_like, optional
+        1-D array of largest possible distance in each dimension, see
+        :func:`distance_matrix`.
+    squared : bool, optional
+        If True, the squared distances are returned.
+    block_bytes : int, optional
+        Memory budget for the temporary arrays of one block. Default is the
+        package-wide option, see :func:`set_options`.
+    dtype : data-type, optional
+        Floating point type of the computations and the result. Default is
+        the package-wide option, see :func:`set_options`.
+
+    Returns
+    -------
+    distances : numpy array
+        1-D array of ``n * (n - 1) / 2`` distances.
+    """
+    points = np.atleast_2d(points)
+    if block_bytes is None:
+        block_bytes = _options["block_bytes"]
+    num_points, dimension = points.shape
+    dtype = _compute_dtype(dtype, points)
     if max_dist is not None:
-        diff = np.abs(diff)
-        diff = np.minimum(diff, max_dist - diff)
-        assert (diff >= 0).all()  # are all points inside the cuboid?
-    return np.linalg.norm(diff, axis=-1, ord=norm)
+        max_dist = np.asarray(max_dist, dtype=dtype)
+    condensed = np.empty(num_points * (num_points - 1) // 2, dtype=dtype)
+    pair_bytes = max(dimension * dtype.itemsize, 1)
+    # blocks of few rows, each compared to all points with a larger index, so
+    # that hardly any distances below the diagonal are computed
+    rows_per_block = int(block_bytes // (max(num_points, 1) * pair_bytes))
+    rows_per_block = max(1, min(rows_per_block, max(8, num_points // 16)))
+
+    def compute_block(start):
+        stop = min(start + rows_per_block, num_points - 1)
+        block_points = points[start:stop].astype(dtype, copy=False)
+        cols_per_tile = max(1, int(block_bytes // ((stop - start) * pair_bytes)))
+        for col_start in range(start + 1, num_points, cols_per_tile):
+            col_stop = min(col_start + cols_per_tile, num_points)
+            tile = _distance_tile(
+                block_points,
+                points[col_start:col_stop].astype(dtype, copy=False),
+                norm,
+                max_dist,
+                squared,
+            )
+            # write the part of each row with j > i into its place
+            for i in range(start, min(stop, col_stop - 1)):
+                first_col = max(i + 1, col_start)
+                offset = num_points * i - i * (i + 1) // 2 + first_col - i - 1
+                row = tile[i - start, first_col - col_start :]
+                condensed[offset : offset + len(row)] = row
+
+    # the blocks write to disjoint parts of the result
+    for _ in _parallel_map(compute_block, range(0, num_points - 1, rows_per_block)):
+        pass
+    return condensed
+
+
+def reduce_condensed(condensed, num_points, reduce="min"):
+    """Reduce condensed pairwise distances for each point.
+
+    The distance of a point to itself is not considered.
+
+    Parameters
+    ----------
+    condensed : array_like
+        1-D array of pairwise distances as returned by
+        :func:`condensed_distance_matrix`.
+    num_points : int
+        The number of points `n` the distances belong to.
+    reduce : str, optional
+        The reduction to apply. Must be one of ("min", "max", "sum").
+
+    Returns
+    -------
+    reduced : numpy array
+        1-D array of `n` values, e.g., the nearest-neighbor distances.
+    """
+    condensed = np.asarray(condensed)
+    assert len(condensed) == num_points * (num_points - 1) // 2
+    if reduce == "min":
+        reduced = np.full(num_points, np.inf)
+        combine = np.minimum
+    elif reduce == "max":
+        reduced = np.full(num_points, -np.inf)
+        combine = np.maximum
+    elif reduce == "sum":
+        reduced = np.zeros(num_points)
+        combine = np.add
+    else:
+        raise ValueError("Unknown reduction '" + str(reduce) + "'")
+    if num_points < 2:
+        return reduced
+    # start of the distances from point i to all points j > i
+    row_starts = np.arange(num_points)
+    row_starts = row_starts * (2 * num_points - row_starts - 1) // 2
+    reduced[:-1] = combine.reduceat(condensed, row_starts[:-1], dtype=np.float64)
+    # distances from point j to all points i < j, processed in chunks
+    chunk_size = max(1, _options["block_bytes"] // 16)
+    for chunk_start in range(0, len(condensed), chunk_size):
+        chunk_stop = min(chunk_start + chunk_size, len(condensed))
+        positions = np.arange(chunk_start, chunk_stop)
+        rows = np.searchsorted(row_starts, positions, side="right") - 1
+        cols = positions - row_starts[rows] + rows + 1
+        values = condensed[chunk_start:chunk_stop]
+        if reduce == "sum":
+            reduced += np.bincount(cols, weights=values, minlength=num_points)
+        else:
+            combine.at(reduced, cols, values)
+    return reduced
+
+
+class SpatialIndex:
+    """Nearest-neighbor index for a dynamic point set.
+
+    The index is backed by a :class:`scipy.spatial.cKDTree`, which supports
+    L1, L2, and L-infinity distance (any :math:`L_p` norm with
+    :math:`p \\geq 1`), as well as periodic boundaries. As the tree itself is
+    static, points inserted or moved after its construction are kept in a
+    small buffer that is searched exhaustively, and the tree is rebuilt
+    when the buffer grows too large. With the default threshold of about
+    :math:`\\sqrt{n}` changes, a change costs :math:`O(\\sqrt{n} \\log n)`
+    amortized for the rebuilds and a query :math:`O(\\log n + \\sqrt{n})`
+    for the buffer. This is still much cheaper than a linear scan for
+    large `n`.
+
+    Each point is identified by an integer index that does not change over
+    its lifetime. The initial points receive the indices ``0, ..., n - 1``
+    in their given order, inserted points the following indices.
+
+    Parameters
+    ----------
+    points : array_like
+        2-D array of the initial points.
+    norm : int or float, optional
+        Norm to use for the distance, by default 2 (euclidean norm).
+    max_dist : float or array_like, optional
+        Largest possible distance in each dimension, see
+        :func:`distance_matrix`. If given, the cuboid
+        ``[0, max_dist]`` is treated as a torus.
+    rebuild_threshold : int, optional
+        The number of changed points that triggers a rebuild of the tree.
+        Default is ``max(64, 4 * sqrt(n))``, evaluated at each rebuild.
+    """
+
+    def __init__(self, points, norm=2, max_dist=None, rebuild_threshold=None):
+        points = np.array(np.atleast_2d(points), dtype=float)
+        num_points, dimension = points.shape
+        self.norm = norm
+        self.max_dist = max_dist
+        self.dimension = dimension
+        self._fixed_threshold = rebuild_threshold
+        if max_dist is None:
+            self._boxsize = None
+        else:
+            self._boxsize = np.broadcast_to(
+                np.asarray(max_dist, dtype=float), (dimension,)
+            ).copy()
+        self._size = num_points
+        self._points = self._wrap(points)
+        self._active = np.ones(num_points, dtype=bool)
+        self.rebuild()
+
+    def _wrap(self, points):
+        """Map points into the periodic domain."""
+        if self._boxsize is None:
+            return points
+        return points % self._boxsize
+
+    def _grow(self):
+        """Double the capacity of the internal arrays."""
+        capacity = max(2 * len(self._points), 16)
+        points = np.zeros((capacity, self.dimension))
+        points[: self._size] = self._points[: self._size]
+        self._points = points
+        for name in ("_active", "_in_tree", "_stale"):
+            flags = np.zeros(capacity, dtype=bool)
+            old_flags = getattr(self, name)
+            flags[: len(old_flags)] = old_flags
+            setattr(self, name, flags)
+
+    def rebuild(self):
+        """Build the tree from scratch with all currently contained points."""
+        self._tree_ids = np.flatnonzero(self._active[: self._size])
+        self._tree = cKDTree(self._points[self._tree_ids], boxsize=self._boxsize)
+        self._in_tree = np.zeros(len(self._points), dtype=bool)
+        self._in_tree[self._tree_ids] = True
+        self._stale = np.zeros(len(self._points), dtype=bool)
+        self._num_stale = 0
+        self._buffer = set()
+        self._buffer_ids = None
+        if self._fixed_threshold is None:
+            self.rebuild_threshold = max(64, int(4 * len(self._tree_ids) ** 0.5))
+        else:
+            self.rebuild_threshold = self._fixed_threshold
+
+    def _invalidate(self, index):
+        """Mark the tree entry of a point as outdated."""
+        if self._in_tree[index] and not self._stale[index]:
+            self._stale[index] = True
+            self._num_stale += 1
+
+    def _check_rebuild(self):
+        if len(self._buffer) + self._num_stale > self.rebuild_threshold:
+            self.rebuild()
+
+    def __len__(self):
+        return int(self._active[: self._size].sum())
+
+    def __contains__(self, index):
+        return 0 <= index < self._size and bool(self._active[index])
+
+    def __getitem__(self, index):
+        """Return the (wrapped) coordinates of the point with this index."""
+        if index not in self:
+            raise KeyError(index)
+        return self._points[index].copy()
+
+    def insert(self, point):
+        """Add a point and return its index."""
+        if self._size == len(self._points):
+            self._grow()
+        index = self._size
+        self._size += 1
+        self._points[index] = self._wrap(np.asarray(point, dtype=float).ravel())
+        self._active[index] = True
+        self._buffer.add(index)
+        self._buffer_ids = None
+        self._check_rebuild()
+        return index
+
+    def remove(self, index):
+        """Remove the point with the given index."""
+        if index not in self:
+            raise KeyError(index)
+        self._active[index] = False
+        self._buffer.discard(index)
+        self._buffer_ids = None
+        self._invalidate(index)
+        self._check_rebuild()
+
+    def update(self, index, point):
+        """Move the point with the given index to a new position."""
+        if index not in self:
+            raise KeyError(index)
+        self._points[index] = self._wrap(np.asarray(point, dtype=float).ravel())
+        self._invalidate(index)
+        self._buffer.add(index)
+        self._buffer_ids = None
+        self._check_rebuild()
+
+    def query(self, points, k=1, exclude=None):
+        """Find the `k` nearest neighbors of some query points.
+
+        Parameters
+        ----------
+        points : array_like
+            2-D array of `m` query points.
+        k : int, optional
+            The number of neighbors to find for each query point.
+        exclude : int or array_like, optional
+            Index of a contained point that must not be reported, either one
+            for all query points or one for each. This is useful for
+            querying the neighbors of contained points.
+
+        Returns
+        -------
+        distances : numpy array
+            (`m` x `k`) array of distances in ascending order, or 1-D array
+            of `m` distances if ``k == 1``. Missing neighbors have distance
+            infinity.
+        indices : numpy array
+            Indices of the neighbors, in the same shape. Missing neighbors
+            have index -1.
+        """
+        points = self._wrap(np.atleast_2d(np.asarray(points, dtype=float)))
+        num_queries = len(points)
+        if exclude is not None:
+            exclude = np.asarray(exclude)
+            if exclude.ndim > 0:
+                exclude = exclude[:, None]
+        all_dists = []
+        all_ids = []
+        num_in_tree = len(self._tree_ids)
+        if num_in_tree > 0:
+            # stale or excluded tree points are rarely among the nearest
+            # neighbors, so query more of them only when necessary
+            k_tree = min(k + (exclude is not None), num_in_tree)
+            while True:
+                dists, positions = self._tree.query(points, k=k_tree, p=self.norm)
+                dists = dists.reshape(num_queries, k_tree)
+                ids = self._tree_ids[positions.reshape(num_queries, k_tree)]
+                invalid = self._stale[ids]
+                if exclude is not None:
+                    invalid |= ids == exclude
+                num_valid = k_tree - invalid.sum(axis=1)
+                if k_tree == num_in_tree or num_valid.min() >= k:
+                    break
+                k_tree = min(2 * k_tree, num_in_tree)
+            all_dists.append(np.where(invalid, np.inf, dists))
+            all_ids.append(ids)
+        if self._buffer:
+            if self._buffer_ids is None:
+                self._buffer_ids = np.array(sorted(self._buffer))
+            ids = self._buffer_ids
+            dists = _distance_tile(
+                points, self._points[ids], self.norm, self._boxsize, False
+            )
+            ids = ids[None, :].repeat(num_queries, axis=0)
+            if exclude is not None:
+                dists[ids == exclude] = np.inf
+            all_dists.append(dists)
+            all_ids.append(ids)
+        num_candidates = sum(dists.shape[1] for dists in all_dists)
+        if num_candidates < k:
+            all_dists.append(np.full((num_queries, k - num_candidates), np.inf))
+            all_ids.append(np.full((num_queries, k - num_candidates), -1))
+        dists = np.concatenate(all_dists, axis=1)
+        ids = np.concatenate(all_ids, axis=1)
+        if k == 1:
+            # the first minimum, like the stable sort below
+            rows = np.arange(num_queries)
+            columns = np.argmin(dists, axis=1)
+            dists = dists[rows, columns]
+            ids = ids[rows, columns]
+            ids[np.isinf(dists)] = -1
+            return dists, ids
+        order = np.argsort(dists, axis=1, kind="stable")[:, :k]
+        dists = np.take_along_axis(dists, order, axis=1)
+        ids = np.take_along_axis(ids, order, axis=1)
+        ids[np.isinf(dists)] = -1
+        return dists, ids
+
+
+class DistanceContext:
+    """A point set with cached pairwise distance information.
+
+    When several indicators are evaluated for the same points, each of them
+    would compute the same pairwise distances again. All functions in
+    :mod:`diversipy.indicator` accept a context in place of the points, so
+    that the distances (and nearest-neighbor distances) are computed only
+    once for each distance configuration. The cache has a memory budget and
+    evicts the least recently used entries first. The points must not be
+    modified while the context is in use.
+
+    Parameters
+    ----------
+    points : array_like
+        2-D array of `n` points.
+    max_bytes : int, optional
+        Memory budget of the cache. Default is ``16 * BLOCK_BYTES``.
+    """
+
+    def __init__(self, points, max_bytes=None):
+        self.points = np.atleast_2d(np.asarray(points))
+        if max_bytes is None:
+            max_bytes = 16 * BLOCK_BYTES
+        self.max_bytes = max_bytes
+        self._cache = collections.OrderedDict()
+        self._cache_bytes = 0
+
+    def __len__(self):
+        return len(self.points)
+
+    def __array__(self, dtype=None, copy=None):
+        if dtype is None:
+            return self.points
+        return self.points.astype(dtype)
+
+    @property
+    def shape(self):
+        return self.points.shape
+
+    def _cached(self, key, compute):
+        """Return a cached value or compute and store it."""
+        if key in self._cache:
+            self._cache.move_to_end(key)
+            return self._cache[key]
+        value = compute()
+        if value.nbytes <= self.max_bytes:
+            while self._cache_bytes + value.nbytes > self.max_bytes:
+                _, evicted = self._cache.popitem(last=False)
+                self._cache_bytes -= evicted.nbytes
+            self._cache[key] = value
+            self._cache_bytes += value.nbytes
+        return value
+
+    def clear(self):
+        """Remove all cached values."""
+        self._cache.clear()
+        self._cache_bytes = 0
+
+    def condensed_distances(self, norm=2, max_dist=None, block_bytes=None, dtype=None):
+        """Return the condensed pairwise distances, see
+        :func:`condensed_distance_matrix`."""
+        if max_dist is not None:
+            max_dist = tuple(np.ravel(max_dist).tolist())
+        dtype = _compute_dtype(dtype, self.points)
+        return self._cached(
+            ("condensed", norm, max_dist, dtype.str),
+            lambda: condensed_distance_matrix(
+                self.points,
+                norm=norm,
+                max_dist=max_dist,
+                block_bytes=block_bytes,
+                dtype=dtype,
+            ),
+        )
+
+    def nn_dists(self, norm=2, max_dist=None, block_bytes=None, dtype=None):
+        """Return the distance of each point to its nearest neighbor."""
+        if max_dist is not None:
+            max_dist = tuple(np.ravel(max_dist).tolist())
+        dtype = _compute_dtype(dtype, self.points)
+        return self._cached(
+            ("nn_dists", norm, max_dist, dtype.str),
+            lambda: reduce_condensed(
+                self.condensed_distances(norm, max_dist, block_bytes, dtype),
+                len(self.points),
+                "min",
+            ),
+        )
@@ -3,13 +3,36 @@ This module contains several functions to measure diversity and a few
 related concepts. The diversity indicators all have different advantages and
 disadvantages. An overview is given in [Wessing2015]_.
 
+All indicators accept a :class:`DistanceContext
+<diversipy.distance.DistanceContext>` in place of the points. Evaluating
+several indicators on the same context computes the pairwise distances
+only once. Distances are computed in single precision if the `dtype` entry
+of `dist_args` or the package-wide option (see
+:func:`set_options <diversipy.distance.set_options>`) is float32, but
+sums are always accumulated in double precision.
+
 """
 import math
 from decimal import Decimal
 import numpy as np
 from scipy.spatial import Voronoi
+from scipy.spatial.distance import squareform
+
+from .distance import (
+    distance_matrix,
+    distance_to_boundary,
+    reduce_distances,
+    condensed_distance_matrix,
+    reduce_condensed,
+    DistanceContext,
+)
 
-from .distance import distance_matrix, distance_to_boundary
+
+def _pairwise_dists(points, dist_args):
+    """Condensed pairwise distances of raw points or a distance context."""
+    if isinstance(points, DistanceContext):
+        return points.condensed_distances(**dist_args)
+    return condensed_distance_matrix(points, **dist_args)
 
 
 def covering_radius(points, repair_margin=1e-8, full_output=False):
@@ -68,7 +91,8 @@ def covering_radius(points, repair_margin=1e-8, full_output=False):
     relevant_vertices = vertices[relevant_indices]
     relevant_vertices = np.minimum(relevant_vertices, 1.0)
     relevant_vertices = np.maximum(relevant_vertices, 0.0)
-    cov_radius = distance_matrix(relevant_vertices, points).min(axis=1).max()
+    sq_dists = reduce_distances(relevant_vertices, points, "min", squared=True)
+    cov_radius = math.sqrt(sq_dists.max())
     if full_output:
         return cov_radius, voronoi_tessellation
     else:
@@ -148,12 +172,12 @@ def covering_radius_lower_bound(
     i = 0
     cr_lb = 0
     while i < len(monte_carlo_points):
-        D = distance_matrix(
-            monte_carlo_points[i : (i + block_size)], points, **dist_args
+        dists = reduce_distances(
+            monte_carlo_points[i : (i + block_size)], points, "min", **dist_args
         )
         i += block_size
-        cr_lb = max(cr_lb, D.min(axis=1).max())
-    return cr_lb
+        cr_lb = max(cr_lb, dists.max())
+    return float(cr_lb)
 
 
 def solow_polasky_diversity(points, activity_param=1.0, dist_args={}):
@@ -187,9 +211,11 @@ def solow_polasky_diversity(points, activity_param=1.0, dist_args={}):
     """
     if len(points) == 0:
         return 0.0
-    points = np.asarray(points)
-    dist_matrix = distance_matrix(points, points, **dist_args)
-    correlation_matrix = np.exp(-activity_param * dist_matrix)
+    dists = _pairwise_dists(points, dist_args)
+    # the pseudoinverse requires double precision
+    correlation = np.exp(-activity_param * dists, dtype=np.float64)
+    correlation_matrix = squareform(correlation, checks=False)
+    np.fill_diagonal(correlation_matrix, 1.0)
     try:
         # compute pseudoinverse
         inverse_matrix = np.linalg.pinv(correlation_matrix)
@@ -258,8 +284,7 @@ def weitzman_diversity(points, dist_args={}):
     num_points = len(points)
     if num_points == 0:
         return 0.0
-    points = np.asarray(points)
-    dist_matrix = distance_matrix(points, points, **dist_args)
+    dist_matrix = squareform(_pairwise_dists(points, dist_args))
     return diversity_recursive(list(range(num_points)), dist_matrix)
 
 
@@ -288,9 +313,8 @@ def sum_of_dists(points, dist_args={}):
     num_points = len(points)
     if num_points == 0:
         return 0.0
-    points = np.asarray(points)
-    dist_matrix = distance_matrix(points, points, **dist_args)
-    spread = math.sqrt(dist_matrix.sum() * 0.5)
+    dists = _pairwise_dists(points, dist_args)
+    spread = math.sqrt(dists.sum(dtype=np.float64))
     return spread
 
 
@@ -322,25 +346,14 @@ def average_inverse_dist(points, exponent=None, max_dist=1.0, dist_args={}):
     num_points = len(points)
     if num_points < 2:
         return 0.0
-    points = np.asarray(points)
-    num_points, dimension = points.shape
+    num_points, dimension = np.shape(points)
     if exponent is None:
         exponent = dimension + 1
-    dist_matrix = distance_matrix(points, points, **dist_args)
-    sum_of_inv_dists = 0.0
-    num_zeros = 0
-    for i in range(num_points):
-        for j in range(i + 1, num_points):
-            distance = dist_matrix[i, j]
-            if distance == 0.0:
-                num_zeros += 1
-            else:
-                sum_of_inv_dists += (max_dist / distance) ** exponent
-    if num_zeros > 0:
+    dists = _pairwise_dists(points, dist_args)
+    if np.any(dists == 0.0):
         return float("inf")
-    else:
-        num_dists = num_points * (num_points - 1) / 2.0
-        return sum_of_inv_dists ** (1.0 / exponent) / num_dists
+    sum_of_inv_dists = np.power(max_dist / dists, exponent, dtype=np.float64).sum()
+    return sum_of_inv_dists ** (1.0 / exponent) / len(dists)
 
 
 def separation_dist(points, dist_args={}):
@@ -364,11 +377,7 @@ def separation_dist(points, dist_args={}):
     num_points = len(points)
     if num_points < 2:
         return 0.0
-    points = np.asarray(points)
-    dist_matrix = distance_matrix(points, points, **dist_args)
-    for i in range(num_points):
-        dist_matrix[i, i] = np.inf
-    min_dist = dist_matrix.min()
+    min_dist = _pairwise_dists(points, dist_args).min()
     return min_dist
 
 
@@ -515,12 +524,12 @@ def sum_of_nn_dists(points, dist_args={}):
     num_points = len(points)
     if num_points < 2:
         return 0.0
-    points = np.asarray(points)
-    dist_matrix = distance_matrix(points, points, **dist_args)
-    for i in range(num_points):
-        dist_matrix[i, i] = np.inf
-    nn_dists = dist_matrix.min(axis=0)
-    return nn_dists.sum()
+    if isinstance(points, DistanceContext):
+        nn_dists = points.nn_dists(**dist_args)
+    else:
+        dists = condensed_distance_matrix(points, **dist_args)
+        nn_dists = reduce_condensed(dists, num_points, "min")
+    return nn_dists.sum(dtype=np.float64)
 
 
 def unanchored_L2_discrepancy(points):
@@ -570,12 +579,12 @@ def unanchored_L2_discrepancy(points):
                     points[lo1:hi1, i, None], points[lo2:hi2, i]
                 )
                 part1_matrix *= np.minimum(points[lo1:hi1, i, None], points[lo2:hi2, i])
-            batch_sum = part1_matrix.sum()
+            batch_sum = part1_matrix.sum(dtype=np.float64)
             part1_sum += batch_sum
             if j != k:
                 part1_sum += batch_sum
     del part1_matrix
-    part2_sum = np.sum((points * (1.0 - points)).prod(axis=1))
+    part2_sum = np.sum((points * (1.0 - points)).prod(axis=1), dtype=np.float64)
     result = part1_sum / num_points ** 2.0
     result -= part2_sum * (2.0 ** (1.0 - dimension) / num_points)
     result += 12 ** -dimension
@@ -599,9 +608,7 @@ def mean_dist_to_boundary(points):
     """Calculate the mean distance to the boundary of this point set."""
     if len(points) == 0:
         return 0.0
-    points = np.asarray(points)
-    assert np.all(points >= 0.0)
-    assert np.all(points <= 1.0)
+    # checks containment in the unit hypercube chunk by chunk
     dists = distance_to_boundary(points)
     return np.mean(dists)
 
@@ -651,11 +658,12 @@ def averaged_hausdorff_dist(points1, points2, exponent=1, dist_args={}):
     points2 = np.asarray(points2)
     num_points, dimension = points2.shape
     assert num_points > 0 and dimension > 0
-    dist_matrix = distance_matrix(points1, points2, **dist_args)
-    min_dists1 = dist_matrix.min(axis=0)
-    min_dists2 = dist_matrix.min(axis=1)
-    part1 = (min_dists1 ** exponent).sum() / len(min_dists1) ** (1.0 / exponent)
-    part2 = (min_dists2 ** exponent).sum() / len(min_dists2) ** (1.0 / exponent)
+    min_dists1 = reduce_distances(points1, points2, "min", axis=0, **dist_args)
+    min_dists2 = reduce_distances(points1, points2, "min", axis=1, **dist_args)
+    part1 = np.sum(min_dists1 ** exponent, dtype=np.float64)
+    part1 /= len(min_dists1) ** (1.0 / exponent)
+    part2 = np.sum(min_dists2 ** exponent, dtype=np.float64)
+    part2 /= len(min_dists2) ** (1.0 / exponent)
     ahd = max(part1, part2)
     return ahd
 
@@ -684,8 +692,7 @@ def hausdorff_dist(points1, points2, dist_args={}):
     points2 = np.asarray(points2)
     num_points, dimension = points2.shape
     assert num_points > 0 and dimension > 0
-    dist_matrix = distance_matrix(points1, points2, **dist_args)
-    min_dists1 = dist_matrix.min(axis=0)
-    min_dists2 = dist_matrix.min(axis=1)
+    min_dists1 = reduce_distances(points1, points2, "min", axis=0, **dist_args)
+    min_dists2 = reduce_distances(points1, points2, "min", axis=1, **dist_args)
     hd_dist = max(min_dists1.max(), min_dists2.max())
     return hd_dist
@@ -90,6 +90,30 @@ def constraints_from_bounds(lower, upper):
     return A, b
 
 
+def contains(points, A, b, tol=0.0):
+    """Check which points satisfy Ax <= b.
+
+    Parameters
+    ----------
+    points : 2d-array of shape (n_points, dimension)
+        The points to check.
+    A : 2d-array of shape (n_constraints, dimension)
+        Left-hand-side of Ax <= b.
+    b : 1d-array of shape (n_constraints)
+        Right-hand-side of Ax <= b.
+    tol : float, optional
+        Tolerance for violations of the constraints, Ax <= b + tol.
+
+    Returns
+    -------
+    1d-array of shape (n_points)
+        Boolean mask of the points contained in the polytope.
+    """
+    check_Ab(A, b)
+    points = np.atleast_2d(points)
+    return np.all(points @ A.T <= b + tol, axis=1)
+
+
 def solve_equality(A, b):
     """Compute a basis of the nullspace of A, and a particular solution to Ax = b.
     This allows to to construct arbitrary solutions as the sum of any vector in the
@@ -1,56 +1,74 @@
+import functools
+import mmap
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 import numpy as np
-from io import StringIO
-
-DIM_MAX = 40  # maximum number of dimensions
-LOG_MAX = 30  # maximum number of bits
-POLY = np.genfromtxt(
-    StringIO(
-        """# POLY, and first 8 columns of V
-        1, 1,  0,  0,  0,  0,  0,  0,  0
-        3, 1,  0,  0,  0,  0,  0,  0,  0
-        7, 1,  1,  0,  0,  0,  0,  0,  0
-        11, 1,  3,  7,  0,  0,  0,  0,  0
-        13, 1,  1,  5,  0,  0,  0,  0,  0
-        19, 1,  3,  1,  1,  0,  0,  0,  0
-        25, 1,  1,  3,  7,  0,  0,  0,  0
-        37, 1,  3,  3,  9,  9,  0,  0,  0
-        59, 1,  3,  7, 13,  3,  0,  0,  0
-        47, 1,  1,  5, 11, 27,  0,  0,  0
-        61, 1,  3,  5,  1, 15,  0,  0,  0
-        55, 1,  1,  7,  3, 29,  0,  0,  0
-        41, 1,  3,  7,  7, 21,  0,  0,  0
-        67, 1,  1,  1,  9, 23, 37,  0,  0
-        97, 1,  3,  3,  5, 19, 33,  0,  0
-        91, 1,  1,  3, 13, 11,  7,  0,  0
-        109, 1,  1,  7, 13, 25,  5,  0,  0
-        103, 1,  3,  5, 11,  7, 11,  0,  0
-        115, 1,  1,  1,  3, 13, 39,  0,  0
-        131, 1,  3,  1, 15, 17, 63, 13,  0
-        193, 1,  1,  5,  5,  1, 27, 33,  0
-        137, 1,  3,  3,  3, 25, 17,115,  0
-        145, 1,  1,  3, 15, 29, 15, 41,  0
-        143, 1,  3,  1,  7,  3, 23, 79,  0
-        241, 1,  3,  7,  9, 31, 29, 17,  0
-        157, 1,  1,  5, 13, 11,  3, 29,  0
-        185, 1,  3,  1,  9,  5, 21,119,  0
-        167, 1,  1,  3,  1, 23, 13, 75,  0
-        229, 1,  3,  3, 11, 27, 31, 73,  0
-        171, 1,  1,  7,  7, 19, 25,105,  0
-        213, 1,  3,  5,  5, 21,  9,  7,  0
-        191, 1,  1,  1, 15,  5, 49, 59,  0
-        253, 1,  1,  1,  1,  1, 33, 65,  0
-        203, 1,  3,  5, 15, 17, 19, 21,  0
-        211, 1,  1,  7, 11, 13, 29,  3,  0
-        239, 1,  3,  7,  5,  7, 11,113,  0
-        247, 1,  1,  5,  3, 15, 19, 61,  0
-        285, 1,  3,  1,  1,  9, 27, 89,  7
-        369, 1,  1,  3,  7, 31, 15, 45, 23
-        299, 1,  3,  3,  9,  9, 25,107, 39
-        """
-    ),
-    delimiter=",",
-    dtype=int,
+
+DIM_MAX = 21201  # maximum number of dimensions
+LOG_MAX = 30  # default number of bits
+BITS_MAX = 64  # maximum number of bits
+SHARD_BYTES = 2 ** 26  # default memory for the arrays of one shard (64 MiB)
+# fmt: off
+POLY = np.array(
+    [
+        # POLY, and first 8 columns of V
+        [  1,   1,   0,   0,   0,   0,   0,   0,   0],
+        [  3,   1,   0,   0,   0,   0,   0,   0,   0],
+        [  7,   1,   1,   0,   0,   0,   0,   0,   0],
+        [ 11,   1,   3,   7,   0,   0,   0,   0,   0],
+        [ 13,   1,   1,   5,   0,   0,   0,   0,   0],
+        [ 19,   1,   3,   1,   1,   0,   0,   0,   0],
+        [ 25,   1,   1,   3,   7,   0,   0,   0,   0],
+        [ 37,   1,   3,   3,   9,   9,   0,   0,   0],
+        [ 59,   1,   3,   7,  13,   3,   0,   0,   0],
+        [ 47,   1,   1,   5,  11,  27,   0,   0,   0],
+        [ 61,   1,   3,   5,   1,  15,   0,   0,   0],
+        [ 55,   1,   1,   7,   3,  29,   0,   0,   0],
+        [ 41,   1,   3,   7,   7,  21,   0,   0,   0],
+        [ 67,   1,   1,   1,   9,  23,  37,   0,   0],
+        [ 97,   1,   3,   3,   5,  19,  33,   0,   0],
+        [ 91,   1,   1,   3,  13,  11,   7,   0,   0],
+        [109,   1,   1,   7,  13,  25,   5,   0,   0],
+        [103,   1,   3,   5,  11,   7,  11,   0,   0],
+        [115,   1,   1,   1,   3,  13,  39,   0,   0],
+        [131,   1,   3,   1,  15,  17,  63,  13,   0],
+        [193,   1,   1,   5,   5,   1,  27,  33,   0],
+        [137,   1,   3,   3,   3,  25,  17, 115,   0],
+        [145,   1,   1,   3,  15,  29,  15,  41,   0],
+        [143,   1,   3,   1,   7,   3,  23,  79,   0],
+        [241,   1,   3,   7,   9,  31,  29,  17,   0],
+        [157,   1,   1,   5,  13,  11,   3,  29,   0],
+        [185,   1,   3,   1,   9,   5,  21, 119,   0],
+        [167,   1,   1,   3,   1,  23,  13,  75,   0],
+        [229,   1,   3,   3,  11,  27,  31,  73,   0],
+        [171,   1,   1,   7,   7,  19,  25, 105,   0],
+        [213,   1,   3,   5,   5,  21,   9,   7,   0],
+        [191,   1,   1,   1,  15,   5,  49,  59,   0],
+        [253,   1,   1,   1,   1,   1,  33,  65,   0],
+        [203,   1,   3,   5,  15,  17,  19,  21,   0],
+        [211,   1,   1,   7,  11,  13,  29,   3,   0],
+        [239,   1,   3,   7,   5,   7,  11, 113,   0],
+        [247,   1,   1,   5,   3,  15,  19,  61,   0],
+        [285,   1,   3,   1,   1,   9,  27,  89,   7],
+        [369,   1,   1,   3,   7,  31,  15,  45,  23],
+        [299,   1,   3,   3,   9,   9,  25, 107,  39],
+    ]
 )
+# fmt: on
+
+# Direction numbers of the dimensions after those in POLY, taken from the file
+# new-joe-kuo-6.21201 by S. Joe and F. Y. Kuo (2008), without the polynomials
+# that already occur in POLY. Each row holds the polynomial and m_1, ..., m_18.
+_JOE_KUO_FILE = os.path.join(os.path.dirname(__file__), "data", "sobol_joe_kuo.npy")
+_joe_kuo = None
+
+
+def _joe_kuo_table():
+    """Memory-map the Joe-Kuo table on first use, so only needed rows are read."""
+    global _joe_kuo
+    if _joe_kuo is None:
+        _joe_kuo = np.load(_JOE_KUO_FILE, mmap_mode="r")
+    return _joe_kuo
 
 
 def _bit_lo0(n):
@@ -62,32 +80,52 @@ def _bit_lo0(n):
     return i
 
 
-def _init(n_dim):
-    """Initialize the Sobol matrix"""
-    poly = POLY[:, 0]
-    V = np.zeros((DIM_MAX, LOG_MAX), dtype=int)
-    V[:, :8] = POLY[:, 1:]
-
+def _direction_numbers(poly, initial):
+    """Direction numbers of one dimension for the given primitive polynomial."""
+    # degree m of the polynomial, i.e., largest m where 2^m < poly
+    poly = int(poly)
+    m = poly.bit_length() - 1
+    v = [int(x) for x in initial[:m]] + [0] * (BITS_MAX - m)
     # Set up remaining components of V, see Bratley and Fox, section 2.
-    V[0] = 1
-    for i in range(1, n_dim):
-        # largest m where 2^m < poly[i]
-        m = len(np.binary_repr(poly[i])) - 1
-        # bit pattern for the given number excluding the leading 1
-        include = np.array([int(b) for b in np.binary_repr(poly[i])[1:]])
-        for j in range(m, LOG_MAX):
-            V[i, j] = V[i, j - m]
-            for k in range(m):
-                if include[k]:
-                    V[i, j] = np.bitwise_xor(V[i, j], 2 ** (k + 1) * V[i, j - k - 1])
-    V *= 2 ** np.arange(LOG_MAX)[::-1]
-    return V[:n_dim]
+    for j in range(m, BITS_MAX):
+        v[j] = v[j - m]
+        for k in range(m):
+            # bit pattern of the polynomial excluding the leading 1
+            if (poly >> (m - 1 - k)) & 1:
+                v[j] ^= 2 ** (k + 1) * v[j - k - 1]
+    return v
+
+
+# unscaled direction numbers computed so far
+_V = np.zeros((0, BITS_MAX), dtype=np.uint64)
+
+
+def _init(n_dim, bits=LOG_MAX):
+    """Return the Sobol matrix of the first `n_dim` dimensions for `bits` bits.
+
+    The unscaled direction numbers are computed only once and cached for
+    subsequent calls.
+    """
+    global _V
+    if len(_V) < n_dim:
+        V = np.ones((n_dim, BITS_MAX), dtype=np.uint64)
+        V[: len(_V)] = _V
+        for i in range(max(len(_V), 1), n_dim):
+            if i < len(POLY):
+                row = POLY[i]
+            else:
+                row = _joe_kuo_table()[i - len(POLY)]
+            V[i] = _direction_numbers(row[0], row[1:])
+        V.setflags(write=False)
+        _V = V
+    # column j holds the (j + 1)-th bit after the binary point
+    return _V[:n_dim, :bits] << np.arange(bits, dtype=np.uint64)[::-1]
 
 
 def _sobol(n_dim):
     """Generator for Sobol points"""
     V = _init(n_dim)
-    lastq = np.zeros(n_dim, dtype=int)
+    lastq = np.zeros(n_dim, dtype=V.dtype)
 
     for i in range(2 ** LOG_MAX):
         sample = lastq / 2 ** LOG_MAX
@@ -96,9 +134,127 @@ def _sobol(n_dim):
         yield sample
 
 
-def sample(n_dim, n_points=1, skip=1):
+def _trailing_zeros(n):
+    """Number of trailing 0-bits of each positive integer in array `n`."""
+    lowest_bit = n & -n
+    # powers of two are represented exactly, so the exponent is exact
+    return np.frexp(lowest_bit.astype(float))[1] - 1
+
+
+def _sobol_batch(V, start, n_points):
+    """Integer representation of Sobol points `start` to `start + n_points - 1`.
+
+    This yields the same points as :func:`_sobol`, but all at once. Point `i`
+    is the XOR of the columns of `V` selected by the bits of the Gray code
+    ``i ^ (i >> 1)``. Starting from this closed form for the first point,
+    the others follow as cumulative XOR of one column per step.
+    """
+    gray = start ^ (start >> 1)
+    first = np.zeros(len(V), dtype=V.dtype)
+    for j in range(V.shape[1]):
+        if (gray >> j) & 1:
+            first ^= V[:, j]
+    points = np.empty((n_points, len(V)), dtype=V.dtype)
+    if n_points == 0:
+        return points
+    points[0] = first
+    # point i + 1 differs from point i in column _bit_lo0(i) = trailing zeros of i + 1
+    indices = np.arange(start + 1, start + n_points, dtype=np.int64)
+    points[1:] = V[:, _trailing_zeros(indices)].T
+    np.bitwise_xor.accumulate(points, axis=0, out=points)
+    return points
+
+
+def _random_bits(shape, bits):
+    """Random unsigned integers with `bits` bits."""
+    return np.random.randint(0, 2 ** bits, size=shape, dtype=np.uint64)
+
+
+def _hash(x):
+    """Mix the bits of the uint64 array `x` (finalizer of SplitMix64)."""
+    x = (x ^ (x >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    x = (x ^ (x >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return x ^ (x >> np.uint64(31))
+
+
+def _digital_shift(points, n_replicates, bits):
+    """XOR each dimension of each replicate with a random integer."""
+    n_dim = points.shape[-1]
+    return points ^ _random_bits((n_replicates, 1, n_dim), bits)
+
+
+def _linear_matrix_scramble(points, n_replicates, bits):
+    """Multiply the digits with random nonsingular lower triangular matrices.
+
+    Digit k of the result (counted from the binary point) is the XOR of digit k
+    and a random selection of the digits before k, so bit ``p`` of an input
+    contributes itself and random lower bits to the output. Finally, a random
+    digital shift is applied.
+    """
+    n_dim = points.shape[1]
+    scrambled = np.zeros((n_replicates,) + points.shape, dtype=np.uint64)
+    for p in range(bits):
+        column = _random_bits((n_replicates, 1, n_dim), p) | np.uint64(1 << p)
+        scrambled ^= ((points >> np.uint64(p)) & np.uint64(1)) * column
+    return _digital_shift(scrambled, n_replicates, bits)
+
+
+def _owen_scramble(points, n_replicates, bits):
+    """Nested uniform scrambling of the digits.
+
+    Each digit is flipped depending on a random bit that is drawn anew for
+    every combination of the preceding digits. Instead of storing this
+    infinite tree of random bits, they are obtained by hashing the preceding
+    digits together with a random seed for each replicate, dimension and digit.
+    """
+    n_dim = points.shape[1]
+    scrambled = np.empty((n_replicates,) + points.shape, dtype=np.uint64)
+    scrambled[...] = points
+    seeds = _random_bits((bits, n_replicates, 1, n_dim), 64)
+    for p in range(bits):
+        if p + 1 < 64:
+            prefix = points >> np.uint64(p + 1)
+        else:
+            prefix = np.zeros_like(points)
+        flips = _hash(prefix ^ seeds[p]) & np.uint64(1)
+        scrambled ^= flips << np.uint64(p)
+    return scrambled
+
+
+_SCRAMBLES = {
+    "shift": _digital_shift,
+    "lms": _linear_matrix_scramble,
+    "owen": _owen_scramble,
+}
+
+
+def _check_args(n_dim, bits, end):
+    """Raise a ValueError if points up to index `end` cannot be generated."""
+    if not (1 <= n_dim <= DIM_MAX):
+        raise ValueError(f"Sobol: n_dim must be between 1 and {DIM_MAX}.")
+    if not (1 <= bits <= BITS_MAX):
+        raise ValueError(f"Sobol: bits must be between 1 and {BITS_MAX}.")
+    # indices are handled as int64
+    log_points = min(bits, 63)
+    if end >= 2**log_points:
+        raise ValueError(f"Sobol: n_points must be < 2**{log_points} including skip")
+
+
+def _to_float(points, bits):
+    """Scale the integer representation of points to [0, 1)."""
+    if bits > 53:
+        # avoid rounding to 1.0 in the conversion
+        points >>= np.uint64(bits - 53)
+        bits = 53
+    return points / 2 ** bits
+
+
+def sample(n_dim, n_points=1, skip=1, bits=LOG_MAX, scramble=None, n_replicates=None):
     """Generate a Sobol point set.
 
+    The first 40 dimensions use the direction numbers of Bratley and Fox,
+    further dimensions (up to 21201) those of Joe and Kuo.
+
     Parameters
     ----------
     n_dim : int
@@ -107,21 +263,175 @@ def sample(n_dim, n_points=1, skip=1):
         Number of points to sample, by default 1
     skip : int, optional
         Number of points in the sequence to skip, by default 1
+    bits : int, optional
+        Number of bits of the integer representation, by default 30. At
+        most ``2**bits`` points can be generated. With more than 53 bits,
+        the coordinates are rounded down to the 53 bits of a double.
+    scramble : str, optional
+        Randomization of the sequence, applied to the integer representation
+        of the points. Must be one of (None, "shift", "lms", "owen"): no
+        randomization (default), a random digital shift, a random linear
+        matrix scrambling followed by a digital shift, or nested uniform
+        (Owen) scrambling. Randomized sequences keep their equidistribution
+        properties, but are unbiased estimators in quasi-Monte Carlo
+        integration. It is usually recommended to use ``skip=0`` then.
+    n_replicates : int, optional
+        Number of independent randomizations of the same points. If given,
+        an array of shape (n_replicates, n_points, n_dim) is returned.
 
     Returns
     -------
-    array, shape=(n_samples, n_dim)
+    array, shape=(n_samples, n_dim) or (n_replicates, n_samples, n_dim)
         Samples from the Sobol sequence.
     """
-    if not (1 <= n_dim <= DIM_MAX):
-        raise ValueError("Sobol: n_dim must be between 1 and 40.")
-    if n_points + skip >= 2**LOG_MAX:
-        raise ValueError(f"Sobol: n_points must be < 2**{LOG_MAX} including skip")
-
-    generator = _sobol(n_dim)
-    for i in range(skip):
-        next(generator)
-    points = np.full((n_points, n_dim), np.nan)
-    for i in range(n_points):
-        points[i] = next(generator)
-    return points
+    _check_args(n_dim, bits, n_points + skip)
+    if scramble is not None and scramble not in _SCRAMBLES:
+        raise ValueError(f"Sobol: unknown scramble '{scramble}'")
+    if n_replicates is not None and scramble is None:
+        raise ValueError("Sobol: n_replicates requires scramble")
+
+    points = _sobol_batch(_init(n_dim, bits), skip, n_points)
+    if scramble is not None:
+        # all replicates share the unscrambled points
+        points = _SCRAMBLES[scramble](points, n_replicates or 1, bits)
+        if n_replicates is None:
+            points = points[0]
+    return _to_float(points, bits)
+
+
+class SobolStream:
+    """Stateful generator of successive batches of Sobol points.
+
+    The stream only stores the index of the next point, so that it can jump
+    to any position of the sequence at no cost and be pickled to checkpoint
+    its state. Each batch starts from the closed form of its first point,
+    which takes ``O(bits * n_dim)`` operations.
+
+    Parameters
+    ----------
+    n_dim : int
+        Number of dimensions
+    skip : int, optional
+        Index of the first point, by default 1, as in :func:`sample`.
+    bits : int, optional
+        Number of bits of the integer representation, see :func:`sample`.
+    """
+
+    def __init__(self, n_dim, skip=1, bits=LOG_MAX):
+        _check_args(n_dim, bits, skip)
+        self.n_dim = n_dim
+        self.bits = bits
+        self.index = skip
+
+    def jump(self, index):
+        """Continue the stream at the point with the given index."""
+        _check_args(self.n_dim, self.bits, index)
+        self.index = index
+
+    def sample(self, n_points=1):
+        """Return the next `n_points` points and advance the stream.
+
+        Returns
+        -------
+        array, shape=(n_points, n_dim)
+            Samples from the Sobol sequence.
+        """
+        _check_args(self.n_dim, self.bits, self.index + n_points)
+        points = _sobol_batch(_init(self.n_dim, self.bits), self.index, n_points)
+        self.index += n_points
+        return _to_float(points, self.bits)
+
+
+def _write_shard(out, n_dim, bits, skip, rows):
+    """Write the points with indices ``skip + rows`` into ``out[rows]``."""
+    points = _sobol_batch(_init(n_dim, bits), skip + rows.start, rows.stop - rows.start)
+    out[rows] = _to_float(points, bits)
+
+
+def _write_shard_to_file(filename, offset, shape, n_dim, bits, skip, rows):
+    """Write a shard into a memory-mapped file (in a worker process)."""
+    out = np.memmap(filename, dtype=np.float64, mode="r+", offset=offset, shape=shape)
+    _write_shard(out, n_dim, bits, skip, rows)
+    out.flush()
+
+
+def sample_parallel(
+    n_dim,
+    n_points,
+    skip=1,
+    bits=LOG_MAX,
+    out=None,
+    n_workers=None,
+    processes=False,
+    shard_size=None,
+):
+    """Generate a Sobol point set in parallel.
+
+    The index range ``[skip, skip + n_points)`` is split into shards, which
+    are generated independently by a pool of threads or processes and
+    written directly into `out`. The result is identical to :func:`sample`.
+
+    Parameters
+    ----------
+    n_dim : int
+        Number of dimensions
+    n_points : int
+        Number of points to sample
+    skip : int, optional
+        Number of points in the sequence to skip, by default 1
+    bits : int, optional
+        Number of bits of the integer representation, see :func:`sample`.
+    out : numpy array, optional
+        (`n_points` x `n_dim`) array to write the result into. For processes,
+        this must be a :class:`numpy.memmap` of float64 (not a view of one),
+        which the workers open by its file name.
+    n_workers : int, optional
+        Number of threads or processes. Default is the number of CPUs.
+    processes : bool, optional
+        If True, a process pool is used instead of a thread pool.
+    shard_size : int, optional
+        Number of points per shard. By default, the temporary arrays of one
+        shard stay within `SHARD_BYTES`.
+
+    Returns
+    -------
+    array, shape=(n_points, n_dim)
+        Samples from the Sobol sequence.
+    """
+    _check_args(n_dim, bits, n_points + skip)
+    if out is None:
+        if processes:
+            raise ValueError("Sobol: processes require a memory-mapped out")
+        out = np.empty((n_points, n_dim))
+    assert out.shape == (n_points, n_dim)
+    if processes:
+        if not isinstance(out, np.memmap) or not isinstance(out.base, mmap.mmap):
+            raise ValueError("Sobol: processes require a memory-mapped out")
+        assert out.dtype == np.float64
+    if n_workers is None:
+        n_workers = os.cpu_count() or 1
+    if shard_size is None:
+        # integer and float representation of each point
+        shard_size = max(1, SHARD_BYTES // (16 * n_dim))
+    shards = [
+        slice(start, min(start + shard_size, n_points))
+        for start in range(0, n_points, shard_size)
+    ]
+    if processes:
+        out.flush()
+        write = functools.partial(
+            _write_shard_to_file, out.filename, out.offset, out.shape
+        )
+        executor_class = ProcessPoolExecutor
+    else:
+        write = functools.partial(_write_shard, out)
+        executor_class = ThreadPoolExecutor
+    write = functools.partial(write, n_dim, bits, skip)
+    if n_workers == 1 or len(shards) < 2:
+        for rows in shards:
+            write(rows)
+    else:
+        with executor_class(n_workers) as executor:
+            # consume the results to propagate exceptions
+            list(executor.map(write, shards))
+    return out
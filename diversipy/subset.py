@@ -4,12 +4,19 @@ you have a set of points in :math:`\\mathbb{R}^n` and want to select a sample
 of them distributed as uniform as possible. This problem is related to
 clustering, with the difference that when using clustering, you usually want
 to retain the structure of the original point set.
+
+The greedy selection algorithms only keep linear-size state in memory and
+stream over the candidate points in chunks, so they also work with
+memory-mapped arrays (:class:`numpy.memmap`) that do not fit into memory.
+As they only compare distances, single precision is usually sufficient,
+which can be requested with ``dtype=np.float32`` in `dist_args` or as
+package-wide option (see :func:`set_options <diversipy.distance.set_options>`).
 """
 import heapq
 import random
 import numpy as np
 
-from .distance import distance_matrix
+from .distance import distance_matrix, reduce_distances
 
 
 class MinBoundingBox:
@@ -357,15 +364,29 @@ def select_greedy_maximin(
     existing_points = np.atleast_2d(existing_points)
     if existing_points.size == 0:
         existing_points = np.array([random.choice(points)])
-    distances = distance_matrix(existing_points, points_array, **dist_args)
-    aggregated_dist_criteria = distances.min(axis=0)
+    # squared (and inexact) Euclidean distances suffice for finding the maximum
+    squared = dist_args.get("norm", 2) == 2
+    aggregated_dist_criteria = reduce_distances(
+        existing_points,
+        points_array,
+        "min",
+        axis=0,
+        squared=squared,
+        exact=False,
+        **dist_args
+    )
     previous_index = np.argmax(aggregated_dist_criteria)
     selected_indices = [previous_index]
     while len(selected_indices) < num_selected_points:
         if callback is not None:
-            callback(selected_indices, aggregated_dist_criteria)
+            if squared:
+                callback(selected_indices, np.sqrt(aggregated_dist_criteria))
+            else:
+                callback(selected_indices, aggregated_dist_criteria)
         previous_point = np.atleast_2d(points_array[previous_index])
-        distances = distance_matrix(previous_point, points_array, **dist_args)
+        distances = distance_matrix(
+            previous_point, points_array, squared=squared, exact=False, **dist_args
+        )
         aggregated_dist_criteria = np.minimum(
             aggregated_dist_criteria, distances.ravel()
         )
@@ -418,15 +439,18 @@ def select_greedy_maxisum(
     existing_points = np.atleast_2d(existing_points)
     if existing_points.size == 0:
         existing_points = np.array([random.choice(points)])
-    distances = distance_matrix(existing_points, points_array, **dist_args)
-    aggregated_dist_criteria = distances.sum(axis=0)
+    aggregated_dist_criteria = reduce_distances(
+        existing_points, points_array, "sum", axis=0, exact=False, **dist_args
+    )
     previous_index = np.argmax(aggregated_dist_criteria)
     selected_indices = [previous_index]
     while len(selected_indices) < num_selected_points:
         if callback is not None:
             callback(selected_indices, aggregated_dist_criteria)
         previous_point = np.atleast_2d(points[previous_index])
-        distances = distance_matrix(previous_point, points_array, **dist_args)
+        distances = distance_matrix(
+            previous_point, points_array, exact=False, **dist_args
+        )
         aggregated_dist_criteria += distances.ravel()
         aggregated_dist_criteria[selected_indices] = -np.inf
         previous_index = np.argmax(aggregated_dist_criteria)
@@ -504,7 +528,7 @@ def select_greedy_energy(
             distances = np.log(1.0 / distances)
         else:
             distances = 1.0 / (distances ** exponent)
-    aggregated_dist_criteria = distances.sum(axis=0)
+    aggregated_dist_criteria = distances.sum(axis=0, dtype=np.float64)
     previous_index = np.argmin(aggregated_dist_criteria)
     selected_indices = [previous_index]
     while len(selected_indices) < num_selected_points:
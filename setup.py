@@ -12,6 +12,7 @@ setup(
     long_description_content_type="text/markdown",
     url="https://github.com/DavidWalz/diversipy",
     packages=find_packages(),
+    package_data={"diversipy": ["data/*.npy"]},
     python_requires=">=3.5",
     install_requires=["numpy", "scipy"],
 )
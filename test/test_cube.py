@@ -1,4 +1,6 @@
+import pickle
 import numpy as np
+import pytest
 import diversipy
 
 
@@ -17,20 +19,137 @@ def test_grid():
     )
 
 
+def test_grid_lazy():
+    X = diversipy.cube.grid(n_levels=3, dimension=4, sukharev=True)
+    G = diversipy.cube.Grid(n_levels=3, dimension=4, sukharev=True)
+    assert len(G) == len(X) == 81
+    np.testing.assert_array_equal(np.asarray(G), X)
+    np.testing.assert_array_equal(G[5], X[5])
+    np.testing.assert_array_equal(G[-1], X[-1])
+    np.testing.assert_array_equal(G[3:70:4], X[3:70:4])
+    np.testing.assert_array_equal(G[[0, 7, -2]], X[[0, 7, -2]])
+    np.testing.assert_array_equal(np.vstack(list(G.chunks(10, start=5))), X[5:])
+    with pytest.raises(IndexError):
+        G[81]
+    # random access also works for grids with more than 2**63 points
+    G = diversipy.cube.Grid(n_levels=10, dimension=30)
+    assert G.num_points == 10 ** 30
+    np.testing.assert_almost_equal(G[10 ** 29 + 5][[0, 1, -1]], [1 / 9, 0, 5 / 9])
+
+
 def test_sample_halton():
     X = diversipy.cube.sample_halton(num_points=100, dimension=20)
     assert (X >= 0).all() and (X <= 1).all() and X.shape == (100, 20)
+    X = diversipy.cube.sample_halton(num_points=3, dimension=2, skip=0)
+    np.testing.assert_array_equal(X, [[0.5, 1 / 3], [0.25, 2 / 3], [0.75, 1 / 9]])
+    for scramble in ("reverse", "random"):
+        Y = diversipy.cube.sample_halton(3, 2, skip=0, scramble=scramble)
+        # base 2 has no nonzero digits to permute
+        np.testing.assert_array_equal(Y[:, 0], X[:, 0])
+        assert np.allclose(np.sort(Y[:2, 1]), [1 / 3, 2 / 3])
+        Y = diversipy.cube.sample_halton(100, 50, scramble=scramble)
+        assert (Y >= 0).all() and (Y <= 1).all() and Y.shape == (100, 50)
+
+
+def test_halton_stream(monkeypatch):
+    stream = diversipy.cube.HaltonStream(dimension=10)
+    points = np.vstack([stream.sample(30), stream.sample(1), stream.sample(69)])
+    np.testing.assert_array_equal(
+        points, diversipy.cube.sample_halton(num_points=100, dimension=10)
+    )
+    assert stream.index == 121
+    stream = diversipy.cube.HaltonStream(dimension=10, scramble="reverse")
+    stream.jump(1000)
+    stream = pickle.loads(pickle.dumps(stream))
+    np.testing.assert_array_equal(
+        stream.sample(50),
+        diversipy.cube.sample_halton(50, 10, skip=999, scramble="reverse"),
+    )
+    # only the low digits reached by the carries are processed
+    stream = diversipy.cube.HaltonStream(dimension=50, skip=10 ** 12)
+    num_digits = []
+    divmod = np.divmod
+
+    def counting_divmod(x, y):
+        num_digits.append(np.broadcast(x, y).size)
+        return divmod(x, y)
+
+    monkeypatch.setattr(np, "divmod", counting_divmod)
+    points = stream.sample(100)
+    monkeypatch.undo()
+    assert sum(num_digits) < 101 * 50 * 3
+    np.testing.assert_array_equal(
+        points, diversipy.cube.sample_halton(100, 50, skip=10 ** 12)
+    )
+
+
+def test_first_primes():
+    primes = diversipy.cube._first_primes(1000)
+    assert primes[:10].tolist() == [2, 3, 5, 7, 11, 13, 17, 19, 23, 29]
+    assert len(primes) == 1000 and primes[-1] == 7919
 
 
 def test_sample_k_means():
     X = diversipy.cube.sample_k_means(num_points=100, dimension=20)
     assert (X >= 0).all() and (X <= 1).all() and X.shape == (100, 20)
+    for dist_args in ({}, {"max_dist": [1.0] * 3}):
+        X = diversipy.cube.sample_k_means(
+            num_points=50, dimension=3, dist_args=dist_args, batch_size=128
+        )
+        assert (X >= 0).all() and (X <= 1).all() and X.shape == (50, 3)
+
+
+def test_sample_cvt():
+    for cloud in ("sobol", "halton", "random"):
+        X = diversipy.cube.sample_cvt(
+            num_points=20, dimension=3, num_iterations=10, cloud=cloud
+        )
+        assert (X >= 0).all() and (X <= 1).all() and X.shape == (20, 3)
+    X = diversipy.cube.sample_cvt(20, 2, tol=1e-3, dist_args={"max_dist": [1, 1]})
+    assert (X >= 0).all() and (X <= 1).all() and X.shape == (20, 2)
+    # a single center converges to the centroid of the cube
+    X = diversipy.cube.sample_cvt(
+        1, 2, num_cloud_points=1024, initial_points=[[0.0, 0.0]]
+    )
+    np.testing.assert_allclose(X, [[0.5, 0.5]], atol=1e-3)
 
 
 def test_sample_maximin():
     X = diversipy.cube.sample_maximin(num_points=100, dimension=5)
     assert (X >= 0).all() and (X <= 1).all() and X.shape == (100, 5)
 
+    existing = np.random.rand(20, 3)
+    X = diversipy.cube.sample_maximin(
+        num_points=50,
+        dimension=3,
+        num_steps=1000,
+        existing_points=existing,
+        use_reflection_edge_correction=True,
+        dist_args={"norm": 2},
+    )
+    assert (X >= 0).all() and (X <= 1).all() and X.shape == (50, 3)
+    assert diversipy.distance.distance_matrix(X, existing).min() > 0
+
+    X = diversipy.cube.sample_maximin(
+        num_points=50,
+        dimension=3,
+        existing_points=existing,
+        use_reflection_edge_correction=True,
+        batch_size=64,
+    )
+    assert (X >= 0).all() and (X <= 1).all() and X.shape == (50, 3)
+
+    # the smallest distance never decreases
+    initial = np.random.rand(30, 2)
+    X = diversipy.cube.sample_maximin(30, 2, num_steps=500, initial_points=initial)
+
+    def separation(points):
+        D = diversipy.distance.distance_matrix(points, points, norm=1, max_dist=1)
+        np.fill_diagonal(D, np.inf)
+        return D.min()
+
+    assert separation(X) >= separation(initial)
+
 
 def test_stratify_conventional():
     pass
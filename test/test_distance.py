@@ -1,4 +1,5 @@
 import numpy as np
+import pytest
 import diversipy
 
 
@@ -31,3 +32,249 @@ def test_distance_matrix():
         diversipy.distance.distance_matrix(points1, points2, norm=1, max_dist=[1, 1]),
         [[0.1], [0.1 + (1 - 0.7)], [0.4 + 0.1]],
     )
+
+
+def test_distance_matrix_blocked():
+    points1 = np.random.rand(50, 3)
+    points2 = np.random.rand(30, 3)
+    for dist_args in ({"norm": 2}, {"norm": 1, "max_dist": [1, 1, 1]}):
+        expected = diversipy.distance.distance_matrix(points1, points2, **dist_args)
+        # budget smaller than a single row forces splitting of the columns
+        blocked = diversipy.distance.distance_matrix(
+            points1, points2, block_bytes=64, **dist_args
+        )
+        np.testing.assert_almost_equal(blocked, expected)
+        out = np.empty((50, 30))
+        result = diversipy.distance.distance_matrix(
+            points1, points2, block_bytes=1000, out=out, **dist_args
+        )
+        assert result is out
+        np.testing.assert_almost_equal(out, expected)
+    # the coordinates of each tile count towards the budget, too
+    points1 = np.random.rand(5000, 50)
+    points2 = np.random.rand(1, 50)
+    for norm in (2, 1):
+        tiles = diversipy.distance._iter_distance_tiles(
+            points1, points2, norm, None, False, block_bytes=2 ** 14
+        )
+        for rows, cols, tile in tiles:
+            num_coords = (rows.stop - rows.start + cols.stop - cols.start) * 50
+            assert num_coords * 8 <= 2 ** 14
+
+
+def test_distance_matrix_squared():
+    points1 = np.random.rand(20, 4)
+    points2 = np.random.rand(10, 4)
+    for dist_args in ({"norm": 2}, {"norm": 1}, {"norm": 2, "max_dist": 1}):
+        distances = diversipy.distance.distance_matrix(points1, points2, **dist_args)
+        sq_distances = diversipy.distance.distance_matrix(
+            points1, points2, squared=True, **dist_args
+        )
+        np.testing.assert_almost_equal(sq_distances, distances ** 2)
+    # round-off of the fast path must not produce negative squared distances
+    sq_distances = diversipy.distance.distance_matrix(
+        points1, points1, squared=True, exact=False
+    )
+    assert np.all(sq_distances >= 0.0)
+    np.testing.assert_almost_equal(np.diag(sq_distances), 0.0)
+    # by default, explicit differences give exact zeros
+    points = 1000 * points1
+    distances = diversipy.distance.distance_matrix(points, points)
+    assert np.all(np.diag(distances) == 0.0)
+    min_dists = diversipy.distance.reduce_distances(points, points)
+    assert np.all(min_dists == 0.0)
+
+
+def test_reduce_distances():
+    points1 = np.random.rand(40, 3)
+    points2 = np.random.rand(25, 3)
+    for dist_args in ({"norm": 2}, {"norm": 1, "max_dist": [1, 1, 1]}):
+        D = diversipy.distance.distance_matrix(points1, points2, **dist_args)
+        for axis in (0, 1):
+            for reduce in ("min", "argmin", "max", "sum"):
+                reduced = diversipy.distance.reduce_distances(
+                    points1, points2, reduce, axis=axis, block_bytes=64, **dist_args
+                )
+                np.testing.assert_almost_equal(reduced, getattr(D, reduce)(axis=axis))
+
+
+def test_condensed_distance_matrix():
+    points = np.random.rand(30, 3)
+    points[-1] = points[0]  # duplicate point
+    for dist_args in ({"norm": 2}, {"norm": 1, "max_dist": [1, 1, 1]}):
+        D = diversipy.distance.distance_matrix(points, points, **dist_args)
+        condensed = diversipy.distance.condensed_distance_matrix(
+            points, block_bytes=500, **dist_args
+        )
+        np.testing.assert_almost_equal(condensed, D[np.triu_indices(30, 1)])
+        assert condensed[28] == 0.0
+        np.fill_diagonal(D, np.inf)
+        np.testing.assert_almost_equal(
+            diversipy.distance.reduce_condensed(condensed, 30, "min"), D.min(axis=0)
+        )
+        np.fill_diagonal(D, 0.0)
+        np.testing.assert_almost_equal(
+            diversipy.distance.reduce_condensed(condensed, 30, "sum"), D.sum(axis=0)
+        )
+        # tiles of single rows and columns, processed by several threads
+        with diversipy.distance.options(num_threads=3):
+            np.testing.assert_equal(
+                diversipy.distance.condensed_distance_matrix(
+                    points, block_bytes=1, **dist_args
+                ),
+                condensed,
+            )
+
+
+def test_num_threads():
+    points1 = np.random.rand(300, 5)
+    points2 = np.random.rand(200, 5)
+    expected = diversipy.distance.distance_matrix(points1, points2, block_bytes=1000)
+    expected_sum = diversipy.distance.reduce_distances(
+        points1, points2, "sum", block_bytes=1000
+    )
+    with diversipy.distance.options(num_threads=4):
+        assert diversipy.get_num_threads() == 4
+        D = diversipy.distance.distance_matrix(points1, points2, block_bytes=1000)
+        sums = diversipy.distance.reduce_distances(
+            points1, points2, "sum", block_bytes=1000
+        )
+    assert diversipy.get_num_threads() == 1
+    # results must be identical, not only close
+    assert np.array_equal(D, expected)
+    assert np.array_equal(sums, expected_sum)
+
+
+def test_dtype():
+    points1 = np.random.rand(50, 4)
+    points2 = np.random.rand(40, 4)
+    expected = diversipy.distance.distance_matrix(points1, points2)
+    for dist_args in ({}, {"max_dist": [1, 1, 1, 1]}, {"norm": 1}):
+        D = diversipy.distance.distance_matrix(
+            points1, points2, dtype=np.float32, **dist_args
+        )
+        assert D.dtype == np.float32
+        np.testing.assert_allclose(
+            D,
+            diversipy.distance.distance_matrix(points1, points2, **dist_args),
+            atol=1e-4,
+        )
+    with diversipy.distance.options(dtype="float32"):
+        D = diversipy.distance.distance_matrix(points1, points2)
+        mins = diversipy.distance.reduce_distances(points1, points2)
+        sums = diversipy.distance.reduce_distances(points1, points2, "sum")
+        condensed = diversipy.distance.condensed_distance_matrix(points1)
+    assert D.dtype == mins.dtype == condensed.dtype == np.float32
+    assert sums.dtype == np.float64
+    # the matrix multiplication loses absolute, not relative accuracy
+    np.testing.assert_allclose(D, expected, atol=1e-4)
+    np.testing.assert_allclose(mins, expected.min(axis=1), atol=1e-4)
+    np.testing.assert_allclose(sums, expected.sum(axis=1), rtol=1e-5)
+    assert diversipy.distance.get_options()["dtype"] is None
+    with pytest.raises(ValueError):
+        diversipy.distance.set_options(dtype=int)
+
+
+def test_spatial_index():
+    points = np.random.rand(100, 3)
+    for dist_args in (
+        {"norm": 2},
+        {"norm": 1, "max_dist": 1},
+        {"norm": np.inf, "max_dist": [1, 1, 1]},
+    ):
+        index = diversipy.distance.SpatialIndex(
+            points, rebuild_threshold=10, **dist_args
+        )
+        current = dict(enumerate(points))
+        for i in range(30):
+            new_point = np.random.rand(3)
+            if i % 3 == 0:
+                current[index.insert(new_point)] = new_point
+            elif i % 3 == 1:
+                index.update(i, new_point)
+                current[i] = new_point
+            else:
+                index.remove(i)
+                del current[i]
+        assert len(index) == len(current)
+        ids = np.array(sorted(current))
+        queries = np.random.rand(20, 3)
+        dists, indices = index.query(queries, k=3)
+        expected = diversipy.distance.distance_matrix(
+            queries, np.array([current[i] for i in ids]), **dist_args
+        )
+        np.testing.assert_almost_equal(dists, np.sort(expected, axis=1)[:, :3])
+        np.testing.assert_array_equal(indices[:, 0], ids[expected.argmin(axis=1)])
+        # nearest neighbor of a contained point, excluding itself
+        all_points = np.array([current[i] for i in ids])
+        dists, indices = index.query(all_points[:1], exclude=ids[0])
+        expected = diversipy.distance.distance_matrix(
+            all_points[:1], all_points[1:], **dist_args
+        )
+        np.testing.assert_almost_equal(dists[0], expected.min())
+        assert indices[0] == ids[1 + expected.argmin()]
+
+
+def test_distance_context():
+    points = np.random.rand(20, 3)
+    context = diversipy.distance.DistanceContext(points)
+    assert len(context) == 20
+    assert np.asarray(context) is context.points
+    condensed = context.condensed_distances(norm=1, max_dist=1)
+    assert context.condensed_distances(norm=1, max_dist=1) is condensed
+    np.testing.assert_almost_equal(
+        condensed,
+        diversipy.distance.condensed_distance_matrix(points, norm=1, max_dist=1),
+    )
+    # least recently used entries are evicted when the budget is exceeded
+    context = diversipy.distance.DistanceContext(points, max_bytes=2 * condensed.nbytes)
+    first = context.condensed_distances(norm=1)
+    context.condensed_distances(norm=2)
+    context.condensed_distances(norm=np.inf)
+    assert context.condensed_distances(norm=1) is not first
+
+
+def test_memmap(tmp_path):
+    points = np.random.rand(500, 4)
+    mapped = np.lib.format.open_memmap(
+        str(tmp_path / "points.npy"), mode="w+", shape=points.shape
+    )
+    mapped[:] = points
+    mapped.flush()
+    mapped = np.load(str(tmp_path / "points.npy"), mmap_mode="r")
+    others = np.random.rand(7, 4)
+    with diversipy.distance.options(block_bytes=1000):
+        for reduce in ("min", "argmin", "sum"):
+            for axis in (0, 1):
+                np.testing.assert_almost_equal(
+                    diversipy.distance.reduce_distances(mapped, others, reduce, axis),
+                    diversipy.distance.reduce_distances(points, others, reduce, axis),
+                )
+        np.testing.assert_almost_equal(
+            diversipy.distance.distance_to_boundary(mapped),
+            diversipy.distance.distance_to_boundary(points),
+        )
+        subset = diversipy.subset.select_greedy_maximin(
+            mapped, 5, existing_points=others
+        )
+    np.testing.assert_almost_equal(
+        subset,
+        diversipy.subset.select_greedy_maximin(points, 5, existing_points=others),
+    )
+
+
+def test_distance_to_polytope_boundary():
+    points = np.random.rand(50, 3)
+    A, b = diversipy.polytope.constraints_from_bounds([0, 0, 0], [1, 1, 1])
+    np.testing.assert_almost_equal(
+        diversipy.distance.distance_to_polytope_boundary(points, A, b, block_bytes=64),
+        diversipy.distance.distance_to_boundary(points),
+    )
+    # triangle x1 >= 0, x2 >= 0, x1 + x2 <= 1
+    A = np.array([[-1, 0], [0, -1], [1, 1]])
+    b = np.array([0, 0, 1])
+    points = np.array([[0.1, 0.2], [0.4, 0.4]])
+    np.testing.assert_almost_equal(
+        diversipy.distance.distance_to_polytope_boundary(points, A, b),
+        [0.1, 0.2 / np.sqrt(2)],
+    )
@@ -51,8 +51,48 @@ def test_expected_dist_to_boundary():
 
 
 def test_averaged_hausdorff_dist():
-    pass
+    X = 100 * np.random.rand(50, 3)
+    assert diversipy.indicator.averaged_hausdorff_dist(X, X) == 0.0
 
 
 def test_hausdorff_dist():
-    pass
+    X = 100 * np.random.rand(50, 3)
+    assert diversipy.indicator.hausdorff_dist(X, X) == 0.0
+
+
+def test_distance_context():
+    points = np.random.rand(10, 3)
+    context = diversipy.distance.DistanceContext(points)
+    indicator = diversipy.indicator
+    for function in (
+        indicator.solow_polasky_diversity,
+        indicator.weitzman_diversity,
+        indicator.sum_of_dists,
+        indicator.average_inverse_dist,
+        indicator.separation_dist,
+        indicator.sum_of_nn_dists,
+        indicator.unanchored_L2_discrepancy,
+        indicator.mean_dist_to_boundary,
+    ):
+        np.testing.assert_almost_equal(function(context), function(points))
+
+
+def test_float32():
+    points = np.random.rand(20, 3)
+    indicator = diversipy.indicator
+    for function in (
+        indicator.sum_of_dists,
+        indicator.average_inverse_dist,
+        indicator.separation_dist,
+        indicator.sum_of_nn_dists,
+    ):
+        np.testing.assert_allclose(
+            function(points, dist_args={"dtype": np.float32}),
+            function(points),
+            rtol=1e-5,
+        )
+    np.testing.assert_allclose(
+        indicator.unanchored_L2_discrepancy(points.astype(np.float32)),
+        indicator.unanchored_L2_discrepancy(points),
+        rtol=1e-5,
+    )
@@ -64,3 +64,14 @@ def test_sample():
     b1 = np.array([1, -0.2])
     X = polytope.sample(n_points=1000, lower=[0, 0], upper=[1, 1], A1=A1, b1=b1)
     assert np.all(X @ A1.T <= b1)
+
+
+def test_contains():
+    A, b = polytope.constraints_from_bounds(lower=[0, 0], upper=[1, 1])
+    points = np.array([[0.5, 0.5], [1.0, 0.0], [1.1, 0.5], [-0.05, 0.2]])
+    np.testing.assert_array_equal(
+        polytope.contains(points, A, b), [True, True, False, False]
+    )
+    np.testing.assert_array_equal(
+        polytope.contains(points, A, b, tol=0.1), [True, True, True, True]
+    )
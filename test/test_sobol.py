@@ -1,4 +1,6 @@
+import pickle
 import numpy as np
+import pytest
 from io import StringIO
 from diversipy import sobol
 
@@ -98,3 +100,87 @@ def test_sobol():
         samples_sobol_40_50,
         sobol.sample(40, 50),
     )
+
+
+def test_sobol_batch():
+    V = sobol._init(7)
+    generator = sobol._sobol(7)
+    expected = np.array([next(generator) for _ in range(300)])
+    np.testing.assert_array_equal(sobol._sobol_batch(V, 0, 300) / 2 ** 30, expected)
+    np.testing.assert_array_equal(sobol.sample(7, 200, skip=100), expected[100:])
+
+
+def test_init_cached():
+    V = sobol._init(10)
+    assert not sobol._V.flags.writeable
+    np.testing.assert_array_equal(sobol._init(3), V[:3])
+    np.testing.assert_array_equal(sobol._init(40)[:10], V)
+
+
+def test_sobol_high_dimension():
+    points = sobol.sample(1000, 64, skip=0)
+    # the first 40 dimensions are unchanged
+    np.testing.assert_array_equal(points[1:51, :40], samples_sobol_40_50)
+    # each dimension of the first 2^k points is a permutation of the grid
+    for k in range(1, 7):
+        np.testing.assert_array_equal(
+            np.sort(points[: 2 ** k], axis=0),
+            np.tile(np.arange(2 ** k)[:, None] / 2 ** k, (1, 1000)),
+        )
+
+
+def test_sobol_bits():
+    points = sobol.sample(5, 100)
+    # more bits only refine the coordinates
+    for bits in (40, 53, 64):
+        points_bits = sobol.sample(5, 100, bits=bits)
+        assert np.all(points_bits < 1.0)
+        np.testing.assert_array_equal(np.floor(points_bits * 2 ** 30) / 2 ** 30, points)
+    points = sobol.sample(3, 4, skip=2 ** 52, bits=64)
+    assert len(np.unique(points, axis=0)) == 4
+    with pytest.raises(ValueError):
+        sobol.sample(3, 10, skip=2 ** 30)
+    with pytest.raises(ValueError):
+        sobol.sample(3, bits=65)
+
+
+def test_sobol_scramble():
+    for scramble in ("shift", "lms", "owen"):
+        points = sobol.sample(4, 64, skip=0, scramble=scramble, n_replicates=3)
+        assert points.shape == (3, 64, 4)
+        assert np.all((points >= 0.0) & (points < 1.0))
+        assert not np.array_equal(points[0], points[1])
+        # each replicate keeps one point per interval [i / 64, (i + 1) / 64)
+        np.testing.assert_array_equal(
+            np.sort(np.floor(points * 64), axis=1),
+            np.broadcast_to(np.arange(64)[:, None], (3, 64, 4)),
+        )
+        assert sobol.sample(4, 8, scramble=scramble, bits=64).shape == (8, 4)
+    with pytest.raises(ValueError):
+        sobol.sample(4, 8, n_replicates=2)
+
+
+def test_sobol_stream():
+    stream = sobol.SobolStream(5)
+    expected = sobol.sample(5, 100)
+    np.testing.assert_array_equal(stream.sample(60), expected[:60])
+    stream = pickle.loads(pickle.dumps(stream))
+    np.testing.assert_array_equal(stream.sample(40), expected[60:])
+    stream.jump(10_000_000)
+    np.testing.assert_array_equal(
+        stream.sample(10), sobol.sample(5, 10, skip=10_000_000)
+    )
+    assert stream.index == 10_000_010
+
+
+def test_sample_parallel(tmp_path):
+    expected = sobol.sample(6, 1000, skip=5)
+    points = sobol.sample_parallel(6, 1000, skip=5, n_workers=3, shard_size=64)
+    np.testing.assert_array_equal(points, expected)
+    out = np.memmap(tmp_path / "sobol.dat", dtype=float, mode="w+", shape=(1000, 6))
+    sobol.sample_parallel(
+        6, 1000, skip=5, out=out, n_workers=2, processes=True, shard_size=300
+    )
+    np.testing.assert_array_equal(out, expected)
+    with pytest.raises(ValueError):
+        sobol.sample_parallel(6, 1000, processes=True)
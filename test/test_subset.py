@@ -24,6 +24,17 @@ def test_select_greedy_maximin():
     )
 
 
+def test_select_greedy_float32():
+    X = np.random.rand(200, 3)
+    for select in (
+        diversipy.subset.select_greedy_maximin,
+        diversipy.subset.select_greedy_maxisum,
+    ):
+        subset = select(X, 10, existing_points=X[0])
+        subset32 = select(X, 10, existing_points=X[0], dist_args={"dtype": "float32"})
+        np.testing.assert_array_equal(subset32, subset)
+
+
 def test_select_greedy_maxisum():
     X = diversipy.cube.grid(n_levels=5, dimension=3)
     subset = diversipy.subset.select_greedy_maxisum(